@@ -0,0 +1 @@
+"""Benchmarks of checkpoint on synthetic repositories."""
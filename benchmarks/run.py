@@ -0,0 +1,315 @@
+"""Run the benchmarks of checkpoint on a synthetic repository.
+
+Usage::
+
+    python -m benchmarks.run --tree small --output results.json
+    python -m benchmarks.run --tree small --compare results.json
+
+Every benchmark is set up before each repetition (outside of the timed
+section) and timed with `time.perf_counter`. The peak memory is measured
+in an extra run under `tracemalloc`, so tracing does not slow down the
+timed runs.
+"""
+import json
+import os
+import platform
+import shutil
+import tracemalloc
+from argparse import ArgumentParser
+from multiprocessing import cpu_count
+from statistics import median
+from tempfile import TemporaryDirectory as InTemporaryDirectory
+from time import perf_counter
+
+from benchmarks.tree import TREES, generate_tree
+from checkpoint import __version__ as version
+from checkpoint.crypt import Crypt
+from checkpoint.metrics import get_peak_memory
+from checkpoint.sequences import CheckpointSequence, IOSequence
+
+#: Name of the checkpoint created by the benchmarks
+CHECKPOINT_NAME = 'benchmark'
+
+
+def _checkpoint_sequence(root_dir, options, action):
+    """Get a checkpoint sequence that performs a single action."""
+    return CheckpointSequence(CHECKPOINT_NAME, {action: 0}, root_dir, [],
+                              num_cores=options.num_cores, pool=options.pool,
+                              compression=options.compression, env='CLI')
+
+
+def _reset_checkpoint(root_dir, options):
+    """Remove the checkpoints of the repository and initialize a new one."""
+    shutil.rmtree(os.path.join(root_dir, '.checkpoint'), ignore_errors=True)
+    _checkpoint_sequence(root_dir, options, 'seq_init_checkpoint').seq_init_checkpoint()
+
+
+def _io_sequence(root_dir, options):
+    return IOSequence(root_dir=root_dir, ignore_dirs=[], num_cores=options.num_cores,
+                      pool=options.pool, compression=options.compression, env='CLI')
+
+
+def _read_contents(io_sequence):
+    """Run the stages of an IO sequence up to the reading of the files."""
+    directory2files = io_sequence.seq_walk_directories()
+    changed = io_sequence.seq_detect_changes(directory2files)
+    extensions = io_sequence.seq_group_files(changed)
+    return io_sequence.seq_map_readers(extensions)
+
+
+def _setup_walk(root_dir, options):
+    return _io_sequence(root_dir, options)
+
+
+def _run_walk(io_sequence):
+    directory2files = io_sequence.seq_walk_directories()
+    return sum(len(files) for files in directory2files.values()), None
+
+
+def _setup_read(root_dir, options):
+    io_sequence = _io_sequence(root_dir, options)
+    return io_sequence, _read_contents(io_sequence)
+
+
+def _run_read(state):
+    io_sequence, readers_extension = state
+    contents = io_sequence.seq_read_files(readers_extension)
+    file2content = [item for content in contents for obj in content
+                    for item in obj.values()]
+    return len(file2content), sum(len(content) for content in file2content)
+
+
+def _setup_encrypt(root_dir, options):
+    _reset_checkpoint(root_dir, options)
+    io_sequence = _io_sequence(root_dir, options)
+    contents = io_sequence.seq_read_files(_read_contents(io_sequence))
+    num_bytes = sum(len(file_content) for content in contents for obj in content
+                    for file_content in obj.values())
+    num_bytes += sum(io_sequence.index[file][0] for file in io_sequence.large_files)
+    return io_sequence, contents, num_bytes
+
+
+def _run_encrypt(state):
+    io_sequence, contents, num_bytes = state
+    return len(io_sequence.seq_encrypt_files(contents)), num_bytes
+
+
+def _setup_crypt(root_dir, options):
+    _reset_checkpoint(root_dir, options)
+    crypt = Crypt(key='crypt.key', key_path=os.path.join(root_dir, '.checkpoint'))
+    io_sequence = _io_sequence(root_dir, options)
+    contents = [file_content for _, file_content in _iter_files(io_sequence)]
+    return crypt, contents
+
+
+def _iter_files(io_sequence):
+    for files in io_sequence.seq_walk_directories().values():
+        for file in files:
+            with open(file, 'rb') as f:
+                yield file, f.read()
+
+
+def _run_crypt(state):
+    crypt, contents = state
+    for content in contents:
+        for _ in crypt.encrypt_stream(content):
+            pass
+
+    return len(contents), sum(len(content) for content in contents)
+
+
+def _setup_create(root_dir, options):
+    _reset_checkpoint(root_dir, options)
+    return _checkpoint_sequence(root_dir, options, 'seq_create_checkpoint')
+
+
+def _run_create(checkpoint_sequence):
+    checkpoint_sequence.seq_create_checkpoint()
+    manifest = checkpoint_sequence._load_checkpoint(CHECKPOINT_NAME)
+    return (len(manifest['files']),
+            sum(size for size, _, _ in manifest['index'].values()))
+
+
+def _setup_restore(root_dir, options):
+    _setup_create(root_dir, options).seq_create_checkpoint()
+    return _checkpoint_sequence(root_dir, options, 'seq_restore_checkpoint')
+
+
+def _run_restore(checkpoint_sequence):
+    restored = checkpoint_sequence.seq_restore_checkpoint()['restored']
+    return len(restored), sum(os.path.getsize(file) for file in restored)
+
+
+#: Benchmarks mapped to their setup, run before every repetition, and
+#: their timed function, which returns the number of processed files and bytes
+BENCHMARKS = {
+    'walk': (_setup_walk, _run_walk),
+    'read': (_setup_read, _run_read),
+    'encrypt': (_setup_encrypt, _run_encrypt),
+    'crypt': (_setup_crypt, _run_crypt),
+    'create': (_setup_create, _run_create),
+    'restore': (_setup_restore, _run_restore),
+}
+
+
+def run_benchmark(name, root_dir, options):
+    """Run a benchmark.
+
+    Parameters
+    ----------
+    name: str
+        Name of the benchmark
+    root_dir: str
+        Root directory of the synthetic repository
+    options: :class: `argparse.Namespace`
+        Options of the run
+
+    Returns
+    -------
+    dict
+        Times of the repetitions, throughput and peak memory
+    """
+    setup, run = BENCHMARKS[name]
+
+    times = []
+    for _ in range(options.repeat):
+        state = setup(root_dir, options)
+        start = perf_counter()
+        num_files, num_bytes = run(state)
+        times.append(perf_counter() - start)
+        del state
+
+    peak_traced_memory = None
+    if options.tracemalloc:
+        state = setup(root_dir, options)
+        tracemalloc.start()
+        try:
+            run(state)
+            peak_traced_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        del state
+
+    best = min(times)
+    return {
+        'name': name,
+        'files': num_files,
+        'bytes': num_bytes,
+        'times': times,
+        'min': best,
+        'median': median(times),
+        'files_per_second': num_files / best if best else None,
+        'mb_per_second': num_bytes / best / 1e6 if best and num_bytes is not None else None,
+        'peak_traced_memory': peak_traced_memory,
+        'peak_rss': get_peak_memory(),
+    }
+
+
+def compare(results, baseline):
+    """Compare the results of a run with a baseline.
+
+    Parameters
+    ----------
+    results: dict
+        Results of the run
+    baseline: dict
+        Results of a previous run
+
+    Returns
+    -------
+    dict
+        Names of the benchmarks in both runs mapped to the ratio of
+        their median times, above 1 means slower than the baseline
+    """
+    baseline_results = {result['name']: result for result in baseline['results']}
+    return {result['name']: result['median'] / baseline_results[result['name']]['median']
+            for result in results['results']
+            if result['name'] in baseline_results and
+            baseline_results[result['name']]['median']}
+
+
+def _format_result(result):
+    _mb = result['mb_per_second']
+    _memory = result['peak_traced_memory']
+    return (f"{result['name']:<10}{result['median']:>10.3f}s"
+            f"{result['files_per_second'] or 0:>12.0f} files/s"
+            f"{_mb if _mb is not None else 0:>10.1f} MB/s"
+            f"{(_memory or 0) / 1e6:>10.1f} MB peak")
+
+
+def main(args=None):
+    parser = ArgumentParser(description='Benchmark checkpoint on a synthetic repository.')
+    parser.add_argument('--tree', choices=list(TREES), default='small',
+                        help='Shape of the synthetic repository.')
+    parser.add_argument('--num-files', type=int, default=None,
+                        help='Override the number of files of the tree.')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='Override the depth of the directories of the tree.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the generator, the same seed gives the same tree.')
+    parser.add_argument('--path', type=str, default=None,
+                        help='Directory the tree is generated in, a temporary '
+                             'directory is used by default.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS),
+                        default=list(BENCHMARKS), help='Benchmarks to run.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed repetitions of every benchmark.')
+    parser.add_argument('--num-cores', '-j', type=int, default=None,
+                        help='Number of workers used for parallel processing.')
+    parser.add_argument('--pool', choices=['threads', 'processes'], default='threads',
+                        help='Pool of workers used to encrypt and restore files.')
+    parser.add_argument('--compression', choices=['zlib', 'lzma', 'zstd'], default=None,
+                        help='Codec used to compress the files.')
+    parser.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false',
+                        help='Do not measure the peak memory with tracemalloc.')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Write the results as JSON to this path.')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Compare the results with a previous JSON output.')
+    options = parser.parse_args(args)
+
+    spec = TREES[options.tree]
+    spec = spec._replace(num_files=options.num_files or spec.num_files,
+                         depth=spec.depth if options.depth is None else options.depth)
+
+    with InTemporaryDirectory() as tdir:
+        root_dir = os.path.abspath(options.path or tdir)
+        os.makedirs(root_dir, exist_ok=True)
+        if os.listdir(root_dir):
+            raise ValueError(f'{root_dir} is not empty')
+
+        totals = generate_tree(root_dir, spec, seed=options.seed)
+        results = {
+            'version': version,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': cpu_count(),
+            'tree': dict(spec._asdict(), name=options.tree, seed=options.seed, **totals),
+            'options': {'num_cores': options.num_cores, 'pool': options.pool,
+                        'compression': options.compression, 'repeat': options.repeat},
+            'results': [],
+        }
+
+        print(f"{options.tree}: {totals['files']} files, {totals['bytes'] / 1e6:.1f} MB")
+        for name in options.benchmarks:
+            result = run_benchmark(name, root_dir, options)
+            results['results'].append(result)
+            print(_format_result(result))
+
+    if options.output:
+        with open(options.output, 'w+') as f:
+            json.dump(results, f, indent=4)
+
+    if options.compare:
+        with open(options.compare, 'r') as f:
+            baseline = json.load(f)
+
+        print(f"Compared with {baseline['version']}:")
+        for name, ratio in compare(results, baseline).items():
+            print(f'{name:<10}{ratio:>8.2f}x')
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
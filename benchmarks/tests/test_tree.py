@@ -0,0 +1,29 @@
+import os
+from tempfile import TemporaryDirectory as InTemporaryDirectory
+
+import numpy.testing as npt
+from benchmarks.tree import TREES, generate_files, generate_tree
+
+
+def test_generate_files():
+    spec = TREES['tiny']._replace(num_files=50)
+
+    # The same spec and seed always give the same files
+    files = list(generate_files(spec, seed=1))
+    npt.assert_equal(files, list(generate_files(spec, seed=1)))
+    npt.assert_equal(files != list(generate_files(spec, seed=2)), True)
+    npt.assert_equal(len(files), 50)
+
+    for rel_path, content in files:
+        extension = rel_path.rsplit('.', 1)[-1]
+        npt.assert_equal(extension in spec.extensions, True)
+        npt.assert_equal(len(rel_path.split(os.sep)) <= spec.depth + 1, True)
+        npt.assert_equal(256 <= len(content) <= 64 * 1024, True)
+
+    with InTemporaryDirectory() as tdir:
+        totals = generate_tree(tdir, spec, seed=1)
+        npt.assert_equal(totals, {'files': 50,
+                                  'bytes': sum(len(content) for _, content in files)})
+        for rel_path, content in files:
+            with open(os.path.join(tdir, rel_path), 'rb') as f:
+                npt.assert_equal(f.read(), content)
@@ -0,0 +1,134 @@
+"""Module that generates deterministic synthetic repositories."""
+import os
+import random
+from collections import namedtuple
+
+#: Shape of a synthetic repository
+#:
+#: - `num_files`: number of files
+#: - `depth`: maximum depth of the directories
+#: - `fanout`: number of sub directories of every directory
+#: - `sizes`: list of (weight, min_size, max_size) buckets the sizes are drawn from
+#: - `extensions`: dictionary of extensions and their weights
+TreeSpec = namedtuple('TreeSpec', ['num_files', 'depth', 'fanout', 'sizes', 'extensions'])
+
+#: Size buckets of a typical source repository, mostly small files and a few large ones
+SOURCE_SIZES = [
+    (60, 256, 4 * 1024),
+    (30, 4 * 1024, 64 * 1024),
+    (9, 64 * 1024, 1024 * 1024),
+    (1, 1024 * 1024, 8 * 1024 * 1024),
+]
+
+#: Extension mix of a typical source repository
+SOURCE_EXTENSIONS = {
+    'py': 30, 'js': 10, 'json': 10, 'md': 5, 'txt': 5,
+    'png': 10, 'jpg': 5, 'bin': 10, 'dat': 10, 'zip': 5,
+}
+
+#: Extensions whose files are generated as text, the others are random bytes
+TEXT_EXTENSIONS = {'py', 'js', 'json', 'md', 'txt', 'html', 'css', 'rst'}
+
+#: Predefined repository shapes
+TREES = {
+    'tiny': TreeSpec(200, 2, 4, SOURCE_SIZES[:2], SOURCE_EXTENSIONS),
+    'small': TreeSpec(2000, 3, 4, SOURCE_SIZES, SOURCE_EXTENSIONS),
+    'medium': TreeSpec(20000, 4, 5, SOURCE_SIZES, SOURCE_EXTENSIONS),
+    'many_small': TreeSpec(50000, 5, 4, SOURCE_SIZES[:1], SOURCE_EXTENSIONS),
+    'few_large': TreeSpec(100, 1, 2, SOURCE_SIZES[2:], {'bin': 1, 'txt': 1}),
+}
+
+_WORDS = ('def class return import from self value index content file path '
+          'checkpoint sequence reader store digest manifest batch worker').split()
+
+
+def _directories(spec):
+    """Get the relative paths of all the directories of a tree."""
+    directories = ['']
+    level = ['']
+    for _ in range(spec.depth):
+        level = [os.path.join(parent, f'dir{idx}')
+                 for parent in level for idx in range(spec.fanout)]
+        directories.extend(level)
+
+    return directories
+
+
+def _text(rng, size):
+    """Generate compressible text of a given size."""
+    lines = [' '.join(rng.choices(_WORDS, k=rng.randint(2, 12))) for _ in range(64)]
+    mean_length = sum(len(line) + 1 for line in lines) / len(lines)
+    content = b''
+    while len(content) < size:
+        num_lines = int((size - len(content)) / mean_length) + 1
+        content += '\n'.join(rng.choices(lines, k=num_lines)).encode('utf-8') + b'\n'
+
+    return content[:size]
+
+
+def generate_files(spec, seed=0):
+    """Generate the files of a synthetic repository.
+
+    The same spec and seed always give the same files.
+
+    Parameters
+    ----------
+    spec: :class: `TreeSpec`
+        Shape of the repository
+    seed: int, optional
+        Seed of the generator
+
+    Yields
+    ------
+    tuple
+        Relative path of the file and its content
+    """
+    rng = random.Random(seed)
+    directories = _directories(spec)
+    extensions = list(spec.extensions)
+    extension_weights = list(spec.extensions.values())
+    size_weights = [weight for weight, _, _ in spec.sizes]
+
+    for idx in range(spec.num_files):
+        directory = rng.choice(directories)
+        extension = rng.choices(extensions, extension_weights)[0]
+        _, min_size, max_size = rng.choices(spec.sizes, size_weights)[0]
+        size = rng.randint(min_size, max_size)
+
+        if extension in TEXT_EXTENSIONS:
+            content = _text(rng, size)
+        else:
+            content = rng.getrandbits(8 * size).to_bytes(size, 'little')
+
+        yield os.path.join(directory, f'file{idx}.{extension}'), content
+
+
+def generate_tree(path, spec, seed=0):
+    """Write a synthetic repository to the disk.
+
+    Parameters
+    ----------
+    path: str
+        Root directory of the repository
+    spec: :class: `TreeSpec`
+        Shape of the repository
+    seed: int, optional
+        Seed of the generator
+
+    Returns
+    -------
+    dict
+        Number of files and total size of the repository
+    """
+    num_files = 0
+    num_bytes = 0
+    for rel_path, content in generate_files(spec, seed):
+        file_path = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+        num_files += 1
+        num_bytes += len(content)
+
+    return {'files': num_files, 'bytes': num_bytes}
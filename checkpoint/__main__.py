@@ -1,9 +1,12 @@
 import os
 from argparse import ArgumentParser
+from tempfile import mkdtemp
 
 from rich import print as rich_print
 
 from checkpoint import __version__ as version
+from checkpoint.metrics import SequenceMetrics, trace_path
+from checkpoint.profiling import StageProfiler
 from checkpoint.sequences import CLISequence
 from checkpoint.utils import execute_command
 
@@ -54,10 +57,100 @@ def run(args=None):
                  ".venv", "node_modules", "__pycache__"],
         help="Ignore directories."
     )
+
+    checkpoint_arg_parser.add_argument(
+        "--no-gitignore",
+        dest="gitignore",
+        action="store_false",
+        help="Do not apply the rules of .gitignore files, "
+             "only the ones of .checkpointignore files.",
+        default=True,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only read and encrypt the files that changed since the current checkpoint.",
+        default=False,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream files into the checkpoint instead of gathering them in memory.",
+        default=False,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--max-inflight-bytes",
+        type=int,
+        help="Maximum bytes of file content held in memory while streaming.",
+        default=None,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--num-cores",
+        "-j",
+        type=int,
+        help="Number of workers used for parallel processing.",
+        default=None,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--pool",
+        type=str,
+        help="Pool of workers used to encrypt files and to restore a checkpoint.",
+        choices=["threads", "processes"],
+        default="threads",
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--compression",
+        type=str,
+        help="Compress the files with this codec before encrypting them.",
+        choices=["zlib", "lzma", "zstd"],
+        default=None,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--differential",
+        action="store_true",
+        help="Only rewrite the files that differ from the restore point.",
+        default=False,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--only",
+        nargs="+",
+        help="Only restore the files matching these glob patterns or directories.",
+        default=None,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--metrics",
+        type=str,
+        help="Write a JSON report of the cost of every stage to this path, "
+             "and a Chrome trace of the stages next to it.",
+        default=None,
+    )
+
+    checkpoint_arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile every stage, including its workers, and write the stats "
+             "of each stage next to the metrics report, or to a temporary "
+             "directory without --metrics.",
+        default=False,
+    )
     if args is not None:
         run_ui = args.run_ui
+        metrics_path = getattr(args, 'metrics', None)
+        profile = getattr(args, 'profile', False)
     else:
-        run_ui = checkpoint_arg_parser.parse_args().run_ui
+        parsed_args = checkpoint_arg_parser.parse_args()
+        run_ui = parsed_args.run_ui
+        metrics_path = parsed_args.metrics
+        profile = parsed_args.profile
 
     if run_ui:
         _dir = os.path.dirname(os.path.abspath(__file__))
@@ -67,9 +160,28 @@ def run(args=None):
             if "exited" in line:
                 exit(0)
     else:
+        metrics = SequenceMetrics() if metrics_path else None
+        profiler = None
+        if profile and metrics_path:
+            # Stats go next to the report, `run.json` gives `run.<sequence>.<stage>.pstats`
+            report_path = os.path.abspath(metrics_path)
+            profiler = StageProfiler(os.path.dirname(report_path),
+                                     prefix=os.path.splitext(os.path.basename(report_path))[0])
+        elif profile:
+            # Never write into the current directory, it is usually the checkpointed tree
+            profiler = StageProfiler(mkdtemp(prefix='checkpoint-profile-'))
+
         cli_sequence = CLISequence(
-            arg_parser=checkpoint_arg_parser, args=args, terminal_log=True, env='CLI')
-        cli_sequence.execute_sequence(pass_args=True)
+            arg_parser=checkpoint_arg_parser, args=args, terminal_log=True, env='CLI',
+            metrics=metrics, profiler=profiler)
+        try:
+            cli_sequence.execute_sequence(pass_args=True)
+        finally:
+            if metrics is not None:
+                metrics.write_report(metrics_path)
+                metrics.write_trace(trace_path(metrics_path))
+            if profiler is not None:
+                print(f'Profiles written to {profiler.output_dir}')
 
 
 if __name__ == "__main__":
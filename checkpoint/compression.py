@@ -0,0 +1,176 @@
+"""Module that provides the codecs used to compress objects before encryption."""
+import lzma
+import os
+import zlib
+
+from checkpoint.constants import COMPRESSED_EXTENSIONS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#: Codecs mapped to the ids stored in the flags of pack records, 0 means uncompressed
+CODECS = {
+    'zlib': 1,
+    'lzma': 2,
+    'zstd': 3,
+}
+
+
+def get_codec_id(codec):
+    """Get the id of a codec.
+
+    Parameters
+    ----------
+    codec: str or None
+        Name of the codec, None for no compression
+
+    Returns
+    -------
+    int
+        Id of the codec
+    """
+    if codec is None:
+        return 0
+
+    if codec not in CODECS:
+        raise ValueError(f'{codec} is an invalid codec, valid codecs are {list(CODECS)}')
+
+    if codec == 'zstd' and zstandard is None:
+        raise ImportError('zstd compression requires the zstandard package')
+
+    return CODECS[codec]
+
+
+def select_codec(file_path, codec):
+    """Select the codec of a file.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the file
+    codec: str or None
+        Name of the codec used for compressible files
+
+    Returns
+    -------
+    str or None
+        Name of the codec, None if the file is already compressed
+    """
+    extension = os.path.basename(file_path).split('.')[-1].lower()
+    if extension in COMPRESSED_EXTENSIONS:
+        return None
+
+    return codec
+
+
+def _compressor(codec_id):
+    if codec_id == CODECS['zlib']:
+        return zlib.compressobj()
+    if codec_id == CODECS['lzma']:
+        return lzma.LZMACompressor()
+    if codec_id == CODECS['zstd']:
+        return zstandard.ZstdCompressor().compressobj()
+
+    raise ValueError(f'Unknown codec id {codec_id}')
+
+
+def _decompressor(codec_id):
+    if codec_id == CODECS['zlib']:
+        return zlib.decompressobj()
+    if codec_id == CODECS['lzma']:
+        return lzma.LZMADecompressor()
+    if codec_id == CODECS['zstd']:
+        if zstandard is None:
+            raise ImportError('zstd compression requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    raise ValueError(f'Unknown codec id {codec_id}')
+
+
+def compress(content, codec):
+    """Compress some content.
+
+    Parameters
+    ----------
+    content: bytes
+        Content that is to be compressed
+    codec: str or None
+        Name of the codec
+
+    Returns
+    -------
+    tuple
+        Compressed content and the id of the codec, the content is
+        returned as is (with the id 0) if compressing does not shrink it
+    """
+    codec_id = get_codec_id(codec)
+    if not codec_id or not content:
+        return content, 0
+
+    compressor = _compressor(codec_id)
+    compressed = compressor.compress(content) + compressor.flush()
+    if len(compressed) >= len(content):
+        return content, 0
+
+    return compressed, codec_id
+
+
+def iter_compress(chunks, codec_id):
+    """Compress content chunk by chunk.
+
+    Parameters
+    ----------
+    chunks: iterable of bytes
+        Chunks of the content
+    codec_id: int
+        Id of the codec
+
+    Yields
+    ------
+    bytes
+        Compressed chunks
+    """
+    if not codec_id:
+        yield from chunks
+        return
+
+    compressor = _compressor(codec_id)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def iter_decompress(chunks, codec_id):
+    """Decompress content chunk by chunk.
+
+    Parameters
+    ----------
+    chunks: iterable of bytes
+        Chunks of the compressed content
+    codec_id: int
+        Id of the codec
+
+    Yields
+    ------
+    bytes
+        Decompressed chunks
+    """
+    if not codec_id:
+        yield from chunks
+        return
+
+    decompressor = _decompressor(codec_id)
+    for chunk in chunks:
+        decompressed = decompressor.decompress(chunk)
+        if decompressed:
+            yield decompressed
+
+    if hasattr(decompressor, 'flush'):
+        remaining = decompressor.flush()
+        if remaining:
+            yield remaining
@@ -16,3 +16,33 @@ FILE_READER2EXTENSIONS = {
         'ipa', 'deb', 'rpm', 'cab', 'pkg', 'mpkg', 'msi', 'msp',
         'mst', 'msu', 'msp', 'mse', 'makefile', '']
 }
+
+#: Default budget (in bytes) of file contents held in memory by streaming sequences
+DEFAULT_INFLIGHT_BYTES = 64 * 1024 * 1024
+
+#: Files larger than this (in bytes) are encrypted chunk by chunk instead of being read into memory
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+#: Files holding gitignore-style rules, read in every walked directory
+IGNORE_FILES = ['.gitignore', '.checkpointignore']
+
+#: Minimum number of seconds between two flushes of the log file of the sequences
+LOG_FLUSH_INTERVAL = 1
+
+#: Number of bytes read from the start of a file to guess its reader
+SNIFF_SIZE = 8192
+
+#: Fixed cost (in bytes) of a file when balancing batches,
+#: so many small files weigh more than their size
+BATCH_FILE_OVERHEAD = 64 * 1024
+
+#: Number of batches per worker, more batches balance better but cost more to dispatch
+BATCHES_PER_WORKER = 4
+
+#: Extensions (from `FILE_READER2EXTENSIONS`) of formats that are already compressed,
+#: their content is stored as is when compression is enabled
+COMPRESSED_EXTENSIONS = [
+    'png', 'jpg', 'jpeg', 'gif', 'webp',
+    'zip', 'rar', '7z', 'gz', 'bz2', 'xz', 'tgz',
+    'dmg', 'apk', 'ipa', 'deb', 'rpm', 'cab'
+]
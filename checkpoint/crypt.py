@@ -1,10 +1,88 @@
 import os
+import struct
 from os.path import join as pjoin
 
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 from checkpoint import io
 
+#: Magic bytes that start every stream encrypted by `Crypt.encrypt_stream`
+STREAM_MAGIC = b'CKPTSTRM'
+
+#: Version of the stream format
+STREAM_VERSION = 1
+
+#: Default size of the plain chunks of an encrypted stream
+CHUNK_SIZE = 1024 * 1024
+
+# magic, version, chunk size, nonce prefix
+_STREAM_HEADER = struct.Struct(f'>{len(STREAM_MAGIC)}sBI8s')
+# length of the encrypted chunk, final chunk flag
+_CHUNK_HEADER = struct.Struct('>I?')
+
+
+def iter_chunks(content, chunk_size=CHUNK_SIZE):
+    """Iterate over the content in chunks.
+
+    Parameters
+    ----------
+    content: file object or iterable of bytes
+        File object opened in binary mode or an iterable of bytes
+    chunk_size: int, optional
+        Size of the chunks, chunks of an iterable are not resized
+
+    Yields
+    ------
+    bytes
+        Chunks of the content
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        content = [content]
+
+    if hasattr(content, 'read'):
+        yield from iter(lambda: content.read(chunk_size), b'')
+    else:
+        for chunk in content:
+            if chunk:
+                yield chunk
+
+
+def is_stream(content):
+    """Check if some encrypted content is in the stream format.
+
+    Parameters
+    ----------
+    content: bytes
+        Encrypted content, or at least its first bytes
+    """
+    return bytes(content[:len(STREAM_MAGIC)]) == STREAM_MAGIC
+
+
+class _ChunkReader:
+    """Read exact amounts of bytes out of a file object or an iterable."""
+
+    def __init__(self, content):
+        self._file = content if hasattr(content, 'read') else None
+        self._chunks = None if self._file else iter_chunks(content)
+        self._buffer = bytearray()
+
+    def read(self, size):
+        if self._file:
+            return self._file.read(size)
+
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
 
 def generate_key(name, path=os.getcwd()):
     """Generate a key to encrypt/decrypt files
@@ -52,6 +130,143 @@ class Crypt:
 
         self.iterations = iterations
         self._fernet = Fernet(self.key)
+        self._aead = AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                                 info=b'checkpoint-stream').derive(self.key))
+
+    def encrypt_content(self, content):
+        """Encrypt some content that is already in memory.
+
+        Parameters
+        ----------
+        content: bytes
+            Content that isto be encrypted
+
+        Returns
+        -------
+        bytes
+            Encrypted content
+        """
+        for _ in range(self.iterations):
+            content = self._fernet.encrypt(content)
+
+        return content
+
+    def decrypt_content(self, content):
+        """Decrypt some content that is already in memory.
+
+        Parameters
+        ----------
+        content: bytes
+            Content that isto be decrypted
+
+        Returns
+        -------
+        bytes
+            Decrypted content
+        """
+        for _ in range(self.iterations):
+            content = self._fernet.decrypt(content)
+
+        return content
+
+    def encrypt_stream(self, content, chunk_size=CHUNK_SIZE):
+        """Encrypt some content chunk by chunk.
+
+        Every chunk is authenticated on its own with AES-GCM, its position
+        in the stream and whether it is the last one, so chunks can neither
+        be reordered nor truncated. Only one chunk is held in memory at a time.
+
+        Parameters
+        ----------
+        content: file object or iterable of bytes
+            Content that isto be encrypted
+        chunk_size: int, optional
+            Size of the plain chunks
+
+        Yields
+        ------
+        bytes
+            Encrypted stream, starting with its header
+        """
+        header = _STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION,
+                                     chunk_size, os.urandom(8))
+        yield header
+
+        nonce_prefix = header[-8:]
+        chunks = self._rechunk(iter_chunks(content, chunk_size), chunk_size)
+        chunk = next(chunks, b'')
+        counter = 0
+        while True:
+            next_chunk = next(chunks, None)
+            final = next_chunk is None
+            nonce = nonce_prefix + struct.pack('>I', counter)
+            encrypted = self._aead.encrypt(
+                nonce, chunk, header + struct.pack('>?', final))
+
+            yield _CHUNK_HEADER.pack(len(encrypted), final) + encrypted
+
+            if final:
+                break
+            chunk = next_chunk
+            counter += 1
+
+    def decrypt_stream(self, content):
+        """Decrypt some content encrypted by `encrypt_stream` chunk by chunk.
+
+        Parameters
+        ----------
+        content: file object or iterable of bytes
+            Content that isto be decrypted
+
+        Yields
+        ------
+        bytes
+            Decrypted chunks
+        """
+        reader = _ChunkReader(content)
+        header = reader.read(_STREAM_HEADER.size)
+        if len(header) != _STREAM_HEADER.size or not is_stream(header):
+            raise ValueError('Content is not an encrypted stream')
+
+        _, version, _, nonce_prefix = _STREAM_HEADER.unpack(header)
+        if version != STREAM_VERSION:
+            raise ValueError(f'Unsupported stream version: {version}')
+
+        counter = 0
+        while True:
+            chunk_header = reader.read(_CHUNK_HEADER.size)
+            if len(chunk_header) != _CHUNK_HEADER.size:
+                raise ValueError('Encrypted stream is truncated')
+
+            length, final = _CHUNK_HEADER.unpack(chunk_header)
+            encrypted = reader.read(length)
+            if len(encrypted) != length:
+                raise ValueError('Encrypted stream is truncated')
+
+            nonce = nonce_prefix + struct.pack('>I', counter)
+            yield self._aead.decrypt(nonce, encrypted,
+                                     header + struct.pack('>?', final))
+
+            if final:
+                break
+            counter += 1
+
+    @staticmethod
+    def _rechunk(chunks, chunk_size):
+        """Resize the chunks of an iterable to `chunk_size`."""
+        buffer = bytearray()
+        for chunk in chunks:
+            if not buffer and len(chunk) == chunk_size:
+                yield bytes(chunk)
+                continue
+
+            buffer += chunk
+            while len(buffer) >= chunk_size:
+                yield bytes(buffer[:chunk_size])
+                del buffer[:chunk_size]
+
+        if buffer:
+            yield bytes(buffer)
 
     def encrypt(self, file, modify_file=False):
         """Encrypt a specific file
@@ -69,8 +284,7 @@ class Crypt:
         else:
             content = file
 
-        for _ in range(self.iterations):
-            content = self._fernet.encrypt(content)
+        content = self.encrypt_content(content)
 
         if modify_file and isfile:
             self._io.write(file, 'wb', content)
@@ -93,8 +307,7 @@ class Crypt:
         else:
             content = bytes(file, 'utf-8')
 
-        for _ in range(self.iterations):
-            content = self._fernet.decrypt(content)
+        content = self.decrypt_content(content)
 
         if modify_file and isfile:
             self._io.write(file, 'wb', content)
@@ -0,0 +1,238 @@
+"""Module that matches paths against gitignore-style rules."""
+import re
+
+
+def translate(pattern):
+    """Translate a gitignore-style glob into a regular expression.
+
+    Unlike `fnmatch.translate`, wildcards never match a `/`, and `**`
+    matches any number of directories.
+
+    Parameters
+    ----------
+    pattern: str
+        Glob pattern, without the negation or the trailing `/`
+
+    Returns
+    -------
+    str
+        Regular expression matching the pattern
+    """
+    parts = pattern.split('/')
+    regex = []
+    for idx, part in enumerate(parts):
+        last = idx == len(parts) - 1
+        if part == '**':
+            regex.append('.*' if last else '(?:[^/]*/)*')
+        else:
+            regex.append(_translate_part(part) + ('' if last else '/'))
+
+    return ''.join(regex)
+
+
+def _translate_part(part):
+    """Translate a single path component of a glob pattern."""
+    regex = []
+    idx, length = 0, len(part)
+    while idx < length:
+        char = part[idx]
+        idx += 1
+        if char == '*':
+            while idx < length and part[idx] == '*':
+                idx += 1
+            regex.append('[^/]*')
+        elif char == '?':
+            regex.append('[^/]')
+        elif char == '\\' and idx < length:
+            regex.append(re.escape(part[idx]))
+            idx += 1
+        elif char == '[':
+            end = idx
+            if end < length and part[end] in '!^':
+                end += 1
+            if end < length and part[end] == ']':
+                end += 1
+            while end < length and part[end] != ']':
+                end += 1
+
+            if end >= length:
+                regex.append('\\[')
+            else:
+                chars = part[idx:end].replace('\\', '\\\\')
+                if chars[0] in '!^':
+                    chars = '^' + chars[1:]
+                regex.append(f'(?!/)[{chars}]')
+                idx = end + 1
+        else:
+            regex.append(re.escape(char))
+
+    return ''.join(regex)
+
+
+class IgnoreRules:
+    """Class to match paths against gitignore-style rules.
+
+    Rules are compiled into a handful of regular expressions, consecutive
+    rules with the same polarity share a single expression. As with git,
+    the last matching rule decides whether a path is ignored.
+    """
+
+    def __init__(self, patterns=None):
+        """Initialize the ignore rules.
+
+        Parameters
+        ----------
+        patterns: list of str, optional
+            Rules relative to the root directory
+        """
+        self._rules = []
+        self._groups = None
+
+        if patterns:
+            self.add_patterns(patterns)
+
+    def __bool__(self):
+        return bool(self._rules)
+
+    def add_patterns(self, patterns, base=''):
+        """Add gitignore-style rules.
+
+        Parameters
+        ----------
+        patterns: list of str
+            Lines of an ignore file
+        base: str, optional
+            Path of the directory of the ignore file, relative to the
+            root directory with `/` as the separator, rules only apply
+            to the paths inside it
+        """
+        base = base.strip('/')
+        prefix = re.escape(f'{base}/') if base else ''
+        for pattern in patterns:
+            rule = self._compile_rule(pattern)
+            if rule:
+                regex, negate = rule
+                self._rules.append((f'^{prefix}{regex}', negate))
+                self._groups = None
+
+    def add_file(self, path, base=''):
+        """Add the rules of an ignore file, if it exists.
+
+        Parameters
+        ----------
+        path: str
+            Path to the ignore file
+        base: str, optional
+            Path of the directory of the ignore file, relative to the
+            root directory
+
+        Returns
+        -------
+        bool
+            True if the ignore file exists
+        """
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                patterns = f.read().splitlines()
+        except (FileNotFoundError, IsADirectoryError, PermissionError):
+            return False
+
+        self.add_patterns(patterns, base=base)
+        return True
+
+    def match(self, path, is_dir=False):
+        """Check if a path is ignored.
+
+        Parameters
+        ----------
+        path: str
+            Path relative to the root directory with `/` as the separator
+        is_dir: bool, optional
+            If True, the path is a directory
+
+        Returns
+        -------
+        bool
+            True if the path is ignored
+        """
+        return bool(self.check(path, is_dir=is_dir))
+
+    def check(self, path, is_dir=False):
+        """Check if a path is ignored or explicitly kept by the rules.
+
+        Parameters
+        ----------
+        path: str
+            Path relative to the root directory with `/` as the separator
+        is_dir: bool, optional
+            If True, the path is a directory
+
+        Returns
+        -------
+        bool or None
+            True if the path is ignored, False if a negated rule keeps
+            it and None if no rule matches it
+        """
+        if not self._rules:
+            return None
+
+        if self._groups is None:
+            self._groups = self._compile_groups()
+
+        subject = f'{path.strip("/")}/' if is_dir else path
+        for regex, negate in self._groups:
+            if regex.match(subject):
+                return not negate
+
+        return None
+
+    def _compile_groups(self):
+        """Merge consecutive rules with the same polarity, last rule first."""
+        groups = []
+        for regex, negate in self._rules:
+            if groups and groups[-1][1] == negate:
+                groups[-1][0].append(regex)
+            else:
+                groups.append(([regex], negate))
+
+        return [(re.compile('|'.join(f'(?:{regex})' for regex in regexes)), negate)
+                for regexes, negate in reversed(groups)]
+
+    @staticmethod
+    def _compile_rule(pattern):
+        """Compile a single gitignore-style rule.
+
+        Returns
+        -------
+        tuple or None
+            Regular expression (without the base) and whether the rule is
+            negated, None for blank lines and comments
+        """
+        if pattern.endswith('\\ '):
+            pattern = pattern[:-2].rstrip(' ') + '\\ '
+        else:
+            pattern = pattern.rstrip(' ')
+
+        if not pattern or pattern.startswith('#'):
+            return None
+
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        elif pattern.startswith(('\\#', '\\!')):
+            pattern = pattern[1:]
+
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if not pattern:
+            return None
+
+        # Patterns with a separator are relative to the ignore file
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+
+        regex = translate(pattern)
+        if not anchored:
+            regex = f'(?:.*/)?{regex}'
+
+        return regex + ('/$' if dir_only else '/?$'), negate
@@ -1,8 +1,12 @@
+import fnmatch
 import os
+import re
 from os.path import isdir
 from os.path import join as pjoin
 from shutil import rmtree
 
+from checkpoint.ignore import IgnoreRules
+
 
 class IO:
     """Class to perform Input/Output opreations.
@@ -21,7 +25,8 @@ class IO:
         `s`: IO has limited permissions (R/A)
     """
 
-    def __init__(self, path=None, mode="a", ignore_dirs=None, lazy=True):
+    def __init__(self, path=None, mode="a", ignore_dirs=None, lazy=True,
+                 ignore_files=None):
         """Initialize the IO class.
 
         Parameters
@@ -37,10 +42,14 @@ class IO:
             List of directories to ignore
         lazy: bool, optional
             If True, the IO class will not update sub_dirs and files
+        ignore_files: list, optional
+            Names of the files holding gitignore-style rules, such files
+            are read in every walked directory
         """
         self._path = str()
         self._mode = str()
         self.ignore_dirs = ignore_dirs or []
+        self.ignore_files = ignore_files or []
         self.files = []
         self.sub_dirs = []
 
@@ -63,7 +72,7 @@ class IO:
 
     def setup(self):
         """Setup the IO class."""
-        self.mode_mappings = {'a': [*'rwxa', 'wb+', 'w+', 'rb+'],
+        self.mode_mappings = {'a': [*'rwxa', 'wb+', 'w+', 'rb', 'rb+'],
                               'm': [*'rwa', 'wb', 'rb'],
                               's': [*'ra', 'rb']}
 
@@ -84,20 +93,119 @@ class IO:
         self.files.clear()
         self.sub_dirs.clear()
 
-        for path, subdirs, files in os.walk(path):
-            if all(dir not in path for dir in self.ignore_dirs):
-                for file in files:
-                    self.files.append(pjoin(path, file))
-
-                for subdir in subdirs:
-                    self.sub_dirs.append(pjoin(path, subdir))
+        for root, entry in self.scan_directory(path, include_dirs=True):
+            if entry.is_dir():
+                self.sub_dirs.append(pjoin(root, entry.name))
+            else:
+                self.files.append(pjoin(root, entry.name))
 
     def walk_directory(self):
         """Walk through the root directory."""
-        for root, _, files in os.walk(self.path):
-            if all(dir not in root for dir in self.ignore_dirs):
-                for file in files:
-                    yield [root, file]
+        for root, entry in self.scan_directory():
+            yield [root, entry.name]
+
+    def scan_directory(self, path=None, include_dirs=False):
+        """Scan through a directory, pruning the ignored directories.
+
+        Ignored directories are never descended into. An entry of
+        `ignore_dirs` matches a directory if it is equal to the name of
+        the directory, or if it is a glob pattern matching the name (or
+        the path relative to the scanned directory if it contains a `/`).
+        Files and directories are also matched against the rules of the
+        `ignore_files` found along the way, which apply to their own
+        directory and below.
+
+        Parameters
+        ----------
+        path: str, optional
+            Path to the directory, defaults to the root directory
+        include_dirs: bool, optional
+            If True, the directories that are not ignored are yielded too
+
+        Yields
+        ------
+        tuple
+            Directory path and the `os.DirEntry` of a file inside it
+        """
+        path = path or self.path
+        is_ignored = self._compile_ignore_dirs()
+
+        # Every directory carries the rules of the ignore files of its
+        # ancestors, each ignore file is compiled once into its own rules
+        stack = [(path, '', ())]
+        while stack:
+            root, rel_root, matchers = stack.pop()
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+
+            if self.ignore_files:
+                names = {entry.name for entry in entries}
+                rules = IgnoreRules()
+                for ignore_file in self.ignore_files:
+                    if ignore_file in names:
+                        rules.add_file(pjoin(root, ignore_file), base=rel_root)
+                if rules:
+                    matchers = matchers + (rules,)
+
+            sub_dirs = []
+            for entry in entries:
+                rel_path = rel_root + entry.name
+                is_dir = entry.is_dir()
+                if matchers and self._match_ignore_rules(matchers, rel_path, is_dir):
+                    continue
+
+                if not is_dir:
+                    yield root, entry
+                    continue
+
+                if is_ignored(entry.name, rel_path):
+                    continue
+
+                if include_dirs:
+                    yield root, entry
+
+                # Same as `os.walk`, symbolic links to directories are not followed
+                if not entry.is_symlink():
+                    sub_dirs.append((entry.path, f'{rel_path}/', matchers))
+
+            stack.extend(reversed(sub_dirs))
+
+    @staticmethod
+    def _match_ignore_rules(matchers, rel_path, is_dir):
+        """Check a path against the rules of its ancestors, the deepest rules first."""
+        for rules in reversed(matchers):
+            ignored = rules.check(rel_path, is_dir=is_dir)
+            if ignored is not None:
+                return ignored
+
+        return False
+
+    def _compile_ignore_dirs(self):
+        """Compile `ignore_dirs` into a matcher of directory names/paths."""
+        names = set()
+        name_patterns = []
+        path_patterns = []
+        for ignore_dir in self.ignore_dirs:
+            ignore_dir = ignore_dir.replace(os.sep, '/').strip('/')
+            if '/' in ignore_dir:
+                path_patterns.append(fnmatch.translate(ignore_dir))
+            elif any(char in ignore_dir for char in '*?['):
+                name_patterns.append(fnmatch.translate(ignore_dir))
+            else:
+                names.add(ignore_dir)
+
+        name_regex = re.compile('|'.join(name_patterns)) if name_patterns else None
+        path_regex = re.compile('|'.join(path_patterns)) if path_patterns else None
+
+        def is_ignored(name, rel_path):
+            return (name in names or
+                    bool(name_regex and name_regex.match(name)) or
+                    bool(path_regex and path_regex.match(rel_path)))
+
+        return is_ignored
 
     def _validate_mode(self, mode):
         if mode not in self.mode_mappings[self.mode]:
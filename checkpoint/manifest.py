@@ -0,0 +1,185 @@
+"""Module that provides a compact, sorted index of the files of a checkpoint."""
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+#: Magic bytes that start every manifest
+MANIFEST_MAGIC = b'CKPTMNFT'
+
+#: Version of the manifest format
+MANIFEST_VERSION = 1
+
+# magic, version, timestamp of the checkpoint, number of entries
+_HEADER = struct.Struct(f'>{len(MANIFEST_MAGIC)}sBqQ')
+# offset of the path, length of the path, size, mtime_ns, mode, inode, digest
+_ENTRY = struct.Struct('>QIQqIQ32s')
+
+#: A file of a manifest, `path` is relative to the root directory with `/` as the separator
+ManifestEntry = namedtuple('ManifestEntry',
+                           ['path', 'size', 'mtime_ns', 'mode', 'ino', 'digest'])
+
+
+def _encode_path(path):
+    return path.encode('utf-8', 'surrogateescape')
+
+
+def write_manifest(path, entries, timestamp=0):
+    """Write a manifest.
+
+    The manifest is made of a header, one fixed size entry per file
+    sorted by path and the paths of the files. Entries can be looked
+    up with a binary search without reading the whole manifest.
+
+    Parameters
+    ----------
+    path: str
+        Path to the manifest
+    entries: iterable of :class: `ManifestEntry`
+        Files of the checkpoint
+    timestamp: int, optional
+        Time at which the checkpoint was created
+    """
+    entries = sorted(((_encode_path(entry.path), entry) for entry in entries),
+                     key=lambda item: item[0])
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_HEADER.pack(MANIFEST_MAGIC, MANIFEST_VERSION,
+                             timestamp, len(entries)))
+
+        path_offset = _HEADER.size + len(entries) * _ENTRY.size
+        for encoded_path, entry in entries:
+            f.write(_ENTRY.pack(path_offset, len(encoded_path), entry.size,
+                                entry.mtime_ns, entry.mode, entry.ino,
+                                bytes.fromhex(entry.digest)))
+            path_offset += len(encoded_path)
+
+        for encoded_path, _ in entries:
+            f.write(encoded_path)
+
+    os.replace(temp_path, path)
+
+
+class Manifest:
+    """Class to look up the files of a manifest.
+
+    The manifest is memory mapped, only the entries that are looked up
+    are read from the disk.
+
+    Attributes
+    ----------
+    path: str
+        Path to the manifest
+    timestamp: int
+        Time at which the checkpoint was created
+    """
+
+    def __init__(self, path):
+        """Initialize the Manifest class.
+
+        Parameters
+        ----------
+        path: str
+            Path to the manifest
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a valid manifest')
+
+        magic, version, self.timestamp, self._length = _HEADER.unpack_from(self._mmap)
+        if magic != MANIFEST_MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a valid manifest')
+        if version != MANIFEST_VERSION:
+            self.close()
+            raise ValueError(f'Unsupported manifest version: {version}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for idx in range(self._length):
+            yield self._entry(idx)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def close(self):
+        """Close the manifest."""
+        self._mmap.close()
+
+    def _path(self, idx):
+        """Get the encoded path of an entry."""
+        offset, length = struct.unpack_from('>QI', self._mmap,
+                                            _HEADER.size + idx * _ENTRY.size)
+        return self._mmap[offset:offset + length]
+
+    def _entry(self, idx):
+        """Get an entry by its position."""
+        offset, length, size, mtime_ns, mode, ino, digest = _ENTRY.unpack_from(
+            self._mmap, _HEADER.size + idx * _ENTRY.size)
+        path = self._mmap[offset:offset + length].decode('utf-8', 'surrogateescape')
+        return ManifestEntry(path, size, mtime_ns, mode, ino, digest.hex())
+
+    def _bisect(self, encoded_path):
+        """Get the position of the first entry not lower than a path."""
+        low, high = 0, self._length
+        while low < high:
+            mid = (low + high) // 2
+            if self._path(mid) < encoded_path:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def get(self, path, default=None):
+        """Look up a file.
+
+        Parameters
+        ----------
+        path: str
+            Path of the file relative to the root directory
+        default: optional
+            Value returned if the file is not in the manifest
+
+        Returns
+        -------
+        :class: `ManifestEntry`
+            Entry of the file
+        """
+        encoded_path = _encode_path(path)
+        idx = self._bisect(encoded_path)
+        if idx < self._length and self._path(idx) == encoded_path:
+            return self._entry(idx)
+
+        return default
+
+    def iter_prefix(self, prefix):
+        """Iterate over the files whose path starts with a prefix.
+
+        Parameters
+        ----------
+        prefix: str
+            Prefix of the paths, e.g. `src/` to list a directory
+
+        Yields
+        ------
+        :class: `ManifestEntry`
+            Entries of the matching files, sorted by path
+        """
+        encoded_prefix = _encode_path(prefix)
+        for idx in range(self._bisect(encoded_prefix), self._length):
+            if not self._path(idx).startswith(encoded_prefix):
+                break
+            yield self._entry(idx)
@@ -0,0 +1,204 @@
+"""Module that records the cost of every stage of a sequence."""
+import json
+import os
+import sys
+from time import perf_counter_ns, process_time_ns, time_ns
+
+from checkpoint import __version__ as version
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_peak_memory():
+    """Get the peak resident memory of the current process.
+
+    Returns
+    -------
+    int or None
+        Peak resident memory in bytes, None if the platform does not
+        report it
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_cpu_time():
+    """Get the CPU time of the current process and its finished children.
+
+    Returns
+    -------
+    int
+        CPU time in nanoseconds
+    """
+    times = os.times()
+    children = times.children_user + times.children_system
+    return process_time_ns() + int(children * 1e9)
+
+
+def trace_path(report_path):
+    """Get the path of the trace that goes next to a run report.
+
+    Parameters
+    ----------
+    report_path: str
+        Path to the run report
+
+    Returns
+    -------
+    str
+        Path to the trace, `report.json` gives `report.trace.json`
+    """
+    root, ext = os.path.splitext(report_path)
+    return f'{root}.trace{ext or ".json"}'
+
+
+class SequenceMetrics:
+    """Class to record the metrics of every sequence function.
+
+    The metrics are recorded through the `on_sequence_function_start`
+    and `on_sequence_function_end` hooks of the sequences they are
+    attached to, sequences executed by a sequence function are nested
+    under it. Every stage records its wall time, the CPU time of the
+    process, the files and bytes it processed and the peak memory of
+    the process when it finished.
+
+    Attributes
+    ----------
+    stages: list of dict
+        Finished stages, in the order they finished
+    """
+
+    def __init__(self):
+        """Initialize the SequenceMetrics class."""
+        self.stages = []
+        self._active = []
+        self._timestamp = time_ns()
+        self._start = perf_counter_ns()
+
+    def attach(self, sequence):
+        """Record the metrics of the functions of a sequence.
+
+        The hooks already set on the sequence are still called, hooks
+        set after attaching replace the metrics.
+
+        Parameters
+        ----------
+        sequence: :class: `checkpoint.sequences.Sequence`
+            Sequence to be recorded
+        """
+        on_start = sequence.on_sequence_function_start
+        on_end = sequence.on_sequence_function_end
+
+        def _on_start(seq):
+            on_start(seq)
+            self.on_sequence_function_start(seq)
+
+        def _on_end(seq):
+            self.on_sequence_function_end(seq)
+            on_end(seq)
+
+        sequence.on_sequence_function_start = _on_start
+        sequence.on_sequence_function_end = _on_end
+
+    def on_sequence_function_start(self, sequence):
+        """Start recording the current function of a sequence."""
+        self._active.append({
+            'sequence': sequence.name,
+            'stage': sequence.current_function,
+            'depth': len(self._active),
+            '_start': perf_counter_ns(),
+            '_cpu': get_cpu_time(),
+        })
+
+    def on_sequence_function_end(self, sequence):
+        """Finish recording the current function of a sequence."""
+        if not self._active:
+            return
+
+        stage = self._active.pop()
+        files, nbytes = sequence.function_counts
+        self.stages.append({
+            'sequence': stage['sequence'],
+            'stage': stage['stage'],
+            'depth': stage['depth'],
+            'status': sequence.function_status,
+            'start': (stage['_start'] - self._start) / 1e9,
+            'wall_time': (perf_counter_ns() - stage['_start']) / 1e9,
+            'cpu_time': (get_cpu_time() - stage['_cpu']) / 1e9,
+            'files': files,
+            'bytes': nbytes,
+            'peak_memory': get_peak_memory(),
+        })
+
+    def to_dict(self):
+        """Get the run report.
+
+        Returns
+        -------
+        dict
+            Version of checkpoint, start of the run (in nanoseconds since
+            the epoch), total wall time and the stages sorted by start,
+            times are in seconds relative to the start of the run
+        """
+        return {
+            'version': version,
+            'timestamp': self._timestamp,
+            'wall_time': (perf_counter_ns() - self._start) / 1e9,
+            'peak_memory': get_peak_memory(),
+            'stages': sorted(self.stages, key=lambda stage: stage['start']),
+        }
+
+    def to_trace(self):
+        """Get the stages as Chrome trace events.
+
+        Returns
+        -------
+        dict
+            Trace in the Chrome trace event format, it can be loaded
+            in `chrome://tracing` or Perfetto
+        """
+        pid = os.getpid()
+        events = []
+        for stage in sorted(self.stages, key=lambda stage: stage['start']):
+            events.append({
+                'name': stage['stage'],
+                'cat': stage['sequence'],
+                'ph': 'X',
+                'ts': stage['start'] * 1e6,
+                'dur': stage['wall_time'] * 1e6,
+                'pid': pid,
+                'tid': 0,
+                'args': {key: stage[key] for key in
+                         ['status', 'cpu_time', 'files', 'bytes', 'peak_memory']},
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_report(self, path):
+        """Write the run report as JSON.
+
+        Parameters
+        ----------
+        path: str
+            Path to the report
+        """
+        with open(path, 'w+') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def write_trace(self, path):
+        """Write the stages as a Chrome trace.
+
+        Parameters
+        ----------
+        path: str
+            Path to the trace
+        """
+        with open(path, 'w+') as f:
+            json.dump(self.to_trace(), f)
@@ -0,0 +1,183 @@
+"""Module that profiles every stage of a sequence separately."""
+import cProfile
+import os
+import pstats
+import shutil
+from tempfile import mkdtemp
+from threading import get_ident
+from uuid import uuid4
+
+
+class ProfiledCall:
+    """Callable that profiles a function run by a worker.
+
+    The stats of every call are dumped into a directory, the calls can
+    run in threads or in worker processes as long as the function can
+    be pickled.
+    """
+
+    def __init__(self, func, worker_dir):
+        """Initialize the ProfiledCall class.
+
+        Parameters
+        ----------
+        func: callable
+            Function that is to be profiled
+        worker_dir: str
+            Directory the stats of the calls are dumped into
+        """
+        self.func = func
+        self.worker_dir = worker_dir
+
+    def __call__(self, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active for the whole process (Python 3.12+),
+            # the calls of this thread are already recorded by it
+            return self.func(*args, **kwargs)
+
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            profile.disable()
+            profile.dump_stats(os.path.join(
+                self.worker_dir, f'{os.getpid()}-{get_ident()}-{uuid4().hex}.pstats'))
+
+
+class StageProfiler:
+    """Class to profile every sequence function separately.
+
+    Stages are profiled through the `on_sequence_function_start` and
+    `on_sequence_function_end` hooks of the sequences they are attached
+    to. A stage only accounts for its own calls, the profile of a stage
+    is paused while a nested sequence runs. Functions run by workers are
+    profiled through `wrap`, their stats are merged into the stage that
+    started them.
+
+    Attributes
+    ----------
+    paths: list of str
+        Paths of the written stats, one per stage
+    """
+
+    def __init__(self, output_dir, prefix='checkpoint'):
+        """Initialize the StageProfiler class.
+
+        Parameters
+        ----------
+        output_dir: str
+            Directory the stats are written to
+        prefix: str, optional
+            Prefix of the stats files, stages are written to
+            `<prefix>.<sequence>.<stage>.pstats`
+        """
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.paths = []
+        self._stats = {}
+        self._active = []
+
+    def attach(self, sequence):
+        """Profile the functions of a sequence.
+
+        The hooks already set on the sequence are still called, hooks
+        set after attaching replace the profiler.
+
+        Parameters
+        ----------
+        sequence: :class: `checkpoint.sequences.Sequence`
+            Sequence to be profiled
+        """
+        on_start = sequence.on_sequence_function_start
+        on_end = sequence.on_sequence_function_end
+
+        def _on_start(seq):
+            on_start(seq)
+            self.on_sequence_function_start(seq)
+
+        def _on_end(seq):
+            self.on_sequence_function_end(seq)
+            on_end(seq)
+
+        sequence.on_sequence_function_start = _on_start
+        sequence.on_sequence_function_end = _on_end
+
+    def on_sequence_function_start(self, sequence):
+        """Start profiling the current function of a sequence."""
+        if self._active:
+            self._active[-1][1].disable()
+
+        profile = cProfile.Profile()
+        # Worker stats are kept out of the output directory, which can be
+        # inside the checkpointed tree
+        self._active.append(((sequence.name, sequence.current_function), profile,
+                             mkdtemp(prefix='checkpoint-workers-')))
+        profile.enable()
+
+    def on_sequence_function_end(self, sequence):
+        """Stop profiling the current function and write its stats."""
+        if not self._active:
+            return
+
+        key, profile, worker_dir = self._active.pop()
+        profile.disable()
+
+        try:
+            stats = pstats.Stats(profile)
+            for file in sorted(os.listdir(worker_dir)):
+                stats.add(os.path.join(worker_dir, file))
+        finally:
+            shutil.rmtree(worker_dir, ignore_errors=True)
+
+        # Stages that run more than once are merged into the same stats
+        if key in self._stats:
+            self._stats[key].add(stats)
+        else:
+            self._stats[key] = stats
+
+        path = self.stats_path(*key)
+        self._stats[key].dump_stats(path)
+        if path not in self.paths:
+            self.paths.append(path)
+
+        if self._active:
+            self._active[-1][1].enable()
+
+    def stats_path(self, sequence_name, function_name):
+        """Get the path of the stats of a stage.
+
+        Parameters
+        ----------
+        sequence_name: str
+            Name of the sequence
+        function_name: str
+            Name of the sequence function
+
+        Returns
+        -------
+        str
+            Path to the stats
+        """
+        return os.path.join(self.output_dir,
+                            f'{self.prefix}.{sequence_name}.{function_name}.pstats')
+
+    def wrap(self, func):
+        """Profile a function that is run by workers.
+
+        Parameters
+        ----------
+        func: callable
+            Function that is to be profiled
+
+        Returns
+        -------
+        callable
+            Function whose calls are merged into the profile of the
+            current stage, the function itself outside of a stage
+        """
+        if not self._active:
+            return func
+
+        return ProfiledCall(func, self._active[-1][2])
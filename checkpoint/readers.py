@@ -1,5 +1,6 @@
 """Module that provides readers for different file extensions."""
 import abc
+import codecs
 import os
 import sys
 from inspect import getmembers
@@ -10,7 +11,7 @@ import numpy as np
 from PIL import Image
 
 from checkpoint.io import IO
-from checkpoint.constants import FILE_READER2EXTENSIONS
+from checkpoint.constants import FILE_READER2EXTENSIONS, SNIFF_SIZE
 
 
 def get_all_readers():
@@ -23,6 +24,103 @@ def get_all_readers():
     return readers
 
 
+#: Extensions mapped to shared reader instances, built on first use
+_READER_REGISTRY = None
+
+
+def get_reader_registry():
+    """Get the extensions mapped to their readers.
+
+    The registry is built once per process, every reader is instantiated
+    a single time and its instance is shared by all of its extensions.
+
+    Returns
+    -------
+    dict
+        Dictionary of extensions and their reader instances
+    """
+    global _READER_REGISTRY
+    if _READER_REGISTRY is None:
+        registry = {}
+        for reader in get_all_readers():
+            reader_obj = reader()
+            for extension in reader_obj.valid_extensions:
+                registry.setdefault(extension, reader_obj)
+
+        _READER_REGISTRY = registry
+
+    return _READER_REGISTRY
+
+
+#: Extensions without a default reader mapped to the reader guessed from their content
+_SNIFFED_READERS = {}
+
+
+def is_text(content):
+    """Check if the content looks like text.
+
+    Content is considered text if it has no null bytes and is valid
+    `utf-8`, a multi-byte character cut at the end is tolerated.
+
+    Parameters
+    ----------
+    content: bytes
+        Content, usually the first bytes of a file
+
+    Returns
+    -------
+    bool
+        True if the content looks like text
+    """
+    if b'\x00' in content:
+        return False
+
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(content, final=False)
+    except UnicodeDecodeError:
+        return False
+
+    return True
+
+
+def sniff_reader(extension, files):
+    """Guess the reader of an extension without a default reader.
+
+    The first bytes of a file are used to pick the text or the byte
+    reader, the verdict is cached so every extension is sniffed once.
+
+    Parameters
+    ----------
+    extension: str
+        Extension of the files
+    files: list
+        Files with the extension
+
+    Returns
+    -------
+    reader: :class: `checkpoint.readers.Reader`
+        Reader instance, None if none of the files could be read
+    """
+    if extension in _SNIFFED_READERS:
+        return _SNIFFED_READERS[extension]
+
+    registry = get_reader_registry()
+    for file in files:
+        try:
+            with open(file, 'rb') as f:
+                prefix = f.read(SNIFF_SIZE)
+        except OSError:
+            continue
+
+        reader_type = TextReader if is_text(prefix) else ByteReader
+        reader = next(reader for reader in registry.values()
+                      if type(reader) is reader_type)
+        _SNIFFED_READERS[extension] = reader
+        return reader
+
+    return None
+
+
 class Reader(metaclass=abc.ABCMeta):
     """Umbrella for all reader classes."""
 
@@ -37,6 +135,8 @@ class Reader(metaclass=abc.ABCMeta):
         self._io = IO()
         self.valid_extensions = valid_extensions or []
         self.num_cores = cpu_count()
+        # Extensions mapped to the result of their validation probe
+        self._supported_extensions = {}
 
     @abc.abstractmethod
     def _read(self, file_path):
@@ -72,7 +172,22 @@ class Reader(metaclass=abc.ABCMeta):
         msg = "This method must be implemented by the child class."
         raise NotImplementedError(msg)
 
-    def read(self, files, validate=True):
+    def _read_raw(self, file_path):
+        """Read the raw bytes of the file.
+
+        Parameters
+        ----------
+        file_path: str
+            Path to the file that is to be read
+
+        Returns
+        -------
+        content: dict
+            Dictionary containing the bytes of the file
+        """
+        return {file_path: self._io.read(file_path, mode='rb')}
+
+    def read(self, files, validate=True, raw=False):
         """Read the content of the file.
 
         Parameters
@@ -81,6 +196,9 @@ class Reader(metaclass=abc.ABCMeta):
             List of files to be read
         validate: bool
             Flag to validate the extensions
+        raw: bool, optional
+            If True, the exact bytes of the files are returned
+            instead of the content decoded by the reader
 
         Returns
         -------
@@ -88,31 +206,47 @@ class Reader(metaclass=abc.ABCMeta):
             Content of the file/files
         """
         # TODO: Add parallelization
-        contents = []
-        exts = []
         if not isinstance(files, list):
             files = [files]
 
-        for file in files:
-            ext = self._io.get_file_extension(file)
-            exts.append(ext)
+        exts = [self._io.get_file_extension(file) for file in files]
 
-        invalid_idxs = self.validate_extensions(exts) or []
+        if validate:
+            for ext in exts:
+                if ext not in self.valid_extensions:
+                    raise ValueError(
+                        f"Invalid file extension: {ext} for reader {self.__class__.__name__}")
 
-        for idx in invalid_idxs:
-            files.pop(idx)
+        # Raw bytes can be read whatever the extension, the validation
+        # probes only matter when the reader decodes the content
+        if not raw:
+            files = [file for file, ext in zip(files, exts) if self.supports(ext)]
 
-        for file in files:
-            _ext = self._io.get_file_extension(file)
-            if validate:
-                if _ext not in self.valid_extensions:
-                    raise ValueError(
-                        f"Invalid file extension: {_ext} for reader {self.__class__.__name__}")
+        _read = self._read_raw if raw else self._read
+        return [_read(file) for file in files]
 
-        for file in files:
-            contents.append(self._read(file))
+    def supports(self, extension):
+        """Check if the reader can decode files with an extension.
 
-        return contents
+        The extension is validated once, the result is cached so reading
+        files never goes through the validation probes again.
+
+        Parameters
+        ----------
+        extension: str
+            Extension to be checked
+
+        Returns
+        -------
+        bool
+            True if the extension is valid for the reader
+        """
+        if extension not in self._supported_extensions:
+            extensions = [extension]
+            invalid_idxs = self._validate_extensions(extensions)
+            self._supported_extensions[extension] = bool(extensions) and not invalid_idxs
+
+        return self._supported_extensions[extension]
 
     def validate_extensions(self, extensions):
         """Validate if the additional extensions are valid.
@@ -138,7 +272,10 @@ class TextReader(Reader):
         super(TextReader, self).__init__(FILE_READER2EXTENSIONS["TEXT_READER"])
 
     def _read(self, file_path):
-        """Read the content of the file.
+        """Read the exact bytes of the file.
+
+        The content is never decoded, so line endings and encodings are
+        preserved, use `decode` when the text itself is needed.
 
         Parameters
         ----------
@@ -148,32 +285,46 @@ class TextReader(Reader):
         Returns
         -------
         content: dict
-            Dictionary containing the content of the file
+            Dictionary containing the bytes of the file
         """
+        return {file_path: self._io.read(file_path, mode='rb')}
 
-        return {file_path: self._io.read(file_path, mode='r')}
+    @staticmethod
+    def decode(content, encoding='utf-8', normalize_newlines=False):
+        """Decode the content of a text file.
+
+        Parameters
+        ----------
+        content: bytes
+            Content of the file, as returned by `read`
+        encoding: str, optional
+            Encoding of the file
+        normalize_newlines: bool, optional
+            If True, `\\r\\n` and `\\r` line endings are translated to `\\n`
+
+        Returns
+        -------
+        text: str
+            Decoded content of the file
+        """
+        text = content.decode(encoding)
+        if normalize_newlines:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+        return text
 
     def _validate_extensions(self, extensions):
         """Validate if the extensions work with the current reader.
 
+        Files are read byte for byte, so every extension can be read and
+        no extension is invalid.
+
         Parameters
         ----------
         extensions: list
             List of extensions to be validated
         """
-        invalid_idxs = []
-
-        with InTemporaryDirectory() as tdir:
-            for ext in extensions:
-                temp_file = os.path.join(tdir, f'test.{ext}')
-                with open(temp_file, 'w+') as f:
-                    try:
-                        f.write('test')
-                        self._read(temp_file)
-                    except UnicodeDecodeError:
-                        invalid_idxs.append(extensions.index(ext))
-
-        return invalid_idxs
+        return []
 
 
 class ImageReader(Reader):
@@ -198,7 +349,31 @@ class ImageReader(Reader):
             Dictionary containing the content of the file
         """
         img_arr = np.asarray(Image.open(file_path))
-        return {file_path: img_arr.tostring()}
+        return {file_path: img_arr.tobytes()}
+
+    def read_metadata(self, file_path):
+        """Read the metadata of an image from its header.
+
+        The pixel data is never decoded.
+
+        Parameters
+        ----------
+        file_path: str
+            Path to the image
+
+        Returns
+        -------
+        metadata: dict
+            Format, width, height and mode of the image, None if the
+            file is not a valid image
+        """
+        try:
+            with Image.open(file_path) as img:
+                width, height = img.size
+                return {'format': img.format, 'width': width,
+                        'height': height, 'mode': img.mode}
+        except (OSError, SyntaxError, ValueError):
+            return None
 
     def _validate_extensions(self, extensions):
         """Validate if the extensions work with the current reader.
@@ -255,14 +430,13 @@ class ByteReader(Reader):
         """
         invalid_idxs = []
         with InTemporaryDirectory() as tdir:
-            for ext in extensions:
+            for idx, ext in enumerate(extensions):
                 temp_file = os.path.join(tdir, f'test.{ext}')
-                with open(temp_file, 'wb') as f:
-                    f.write(b'test')
+                try:
+                    with open(temp_file, 'wb') as f:
+                        f.write(b'test')
                     self._read(temp_file)
-                invalid_idxs.append(extensions.index(ext))
-
-        for idx in invalid_idxs:
-            extensions.pop(idx)
+                except OSError:
+                    invalid_idxs.append(idx)
 
         return invalid_idxs
@@ -1,9 +1,15 @@
 import json
 import os
 from collections import OrderedDict
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+from fnmatch import fnmatch
 from itertools import count
 from multiprocessing import cpu_count
+from queue import Empty, Queue, SimpleQueue
 from tempfile import TemporaryDirectory as InTemporaryDirectory
+from threading import Thread
+from time import time_ns
 from types import MethodType
 
 from joblib import Parallel, delayed
@@ -11,12 +17,18 @@ from joblib import Parallel, delayed
 from rich.progress import Progress, SpinnerColumn
 
 from checkpoint import __version__ as version
+from checkpoint.compression import compress, get_codec_id, select_codec
+from checkpoint.constants import (BATCH_FILE_OVERHEAD, BATCHES_PER_WORKER,
+                                  DEFAULT_INFLIGHT_BYTES, IGNORE_FILES,
+                                  LOG_FLUSH_INTERVAL, STREAM_THRESHOLD)
 from checkpoint.crypt import Crypt, generate_key
 from checkpoint.io import IO
-from checkpoint.readers import get_all_readers
-from checkpoint.utils import LogColors, get_reader_by_extension, Logger
+from checkpoint.manifest import Manifest, ManifestEntry, write_manifest
+from checkpoint.store import STORE_FORMAT, ObjectStore
+from checkpoint.utils import (ByteBudget, LogColors, Logger,
+                              get_reader_by_extension, split_batches)
 
-_logger = Logger()
+_logger = Logger(flush_interval=LOG_FLUSH_INTERVAL)
 
 
 class Sequence:
@@ -25,7 +37,8 @@ class Sequence:
     _progress = Progress(
         SpinnerColumn(), *Progress.get_default_columns(), transient=False)
 
-    def __init__(self, sequence_name, order_dict=None, terminal_log=False, env='UI'):
+    def __init__(self, sequence_name, order_dict=None, terminal_log=False, env='UI',
+                 metrics=None, profiler=None):
         """Initialize the sequence class.
 
         Parameters
@@ -38,6 +51,10 @@ class Sequence:
             Logger for the sequence class
         log: bool, optional
             If True, the sequence will be logged.
+        metrics: :class: `checkpoint.metrics.SequenceMetrics`, optional
+            Metrics recording the cost of every sequence function.
+        profiler: :class: `checkpoint.profiling.StageProfiler`, optional
+            Profiler of every sequence function.
         """
         self.terminal_log = terminal_log
         self.log_mode = 't' if self.terminal_log else 'f'
@@ -61,8 +78,24 @@ class Sequence:
 
         # User hook that is triggered when the sequence/sequence function has finished
         self.on_sequence_end = lambda seq: None
+        self.on_sequence_function_start = lambda seq: None
         self.on_sequence_function_end = lambda seq: None
 
+        #: Name of the sequence function being executed
+        self.current_function = None
+        #: Status of the last sequence function, 'SUCCESS' or 'FAILED'
+        self.function_status = None
+        #: Files and bytes processed by the current sequence function
+        self.function_counts = (0, 0)
+
+        self.metrics = metrics
+        if self.metrics is not None:
+            self.metrics.attach(self)
+
+        self.profiler = profiler
+        if self.profiler is not None:
+            self.profiler.attach(self)
+
     def __repr__(self):
         """Return the string representation of the Sequence."""
         _member_functions = [
@@ -132,6 +165,7 @@ class Sequence:
 
                 _current_task_id = self._task_ids[context_text]
 
+                self._start_sequence_function(func_obj[1])
                 try:
                     if pass_args:
                         if len(_return_values) > 0:
@@ -151,6 +185,7 @@ class Sequence:
                         description=f"{LogColors.ERROR}{_msg} - FAILED{LogColors.ENDC}"
                     )
 
+                    self._end_sequence_function('FAILED')
                     self._stop_progress_bars()
                     raise type(e)(f'{context_text} failed with error: {e}')
 
@@ -166,7 +201,7 @@ class Sequence:
 
                 _return_values.append(_return_value)
 
-                self.on_sequence_function_end(self)
+                self._end_sequence_function('SUCCESS')
                 _return_values.append(_return_value)
 
             _finish_msgs = {
@@ -182,6 +217,7 @@ class Sequence:
                 self.log(_finish_msgs["error"], [
                     LogColors.SUCCESS, LogColors.BOLD], timestamp=True, log_type="ERROR")
 
+            self.logger.flush()
             self._stop_progress_bars()
             self._progress.console.clear_live()
             self.on_sequence_end(self)
@@ -189,9 +225,9 @@ class Sequence:
         elif execution_policy == 'increasing_order':
             for _, func in self.sequence_dict.items():
                 if pass_args:
-                    _return_value = func(_return_values[-1])
+                    _return_value = self._run_sequence_function(func, _return_values[-1])
                 else:
-                    _return_value = func()
+                    _return_value = self._run_sequence_function(func)
 
                 _return_values.append(_return_value)
 
@@ -201,6 +237,55 @@ class Sequence:
                 f'{execution_policy} is an invalid execution policy')
         return _return_values
 
+    def count(self, files=0, nbytes=0):
+        """Add to the files and bytes processed by the current sequence function.
+
+        Parameters
+        ----------
+        files: int, optional
+            Number of processed files.
+        nbytes: int, optional
+            Number of processed bytes.
+        """
+        self.function_counts = (self.function_counts[0] + files,
+                                self.function_counts[1] + nbytes)
+
+    def _start_sequence_function(self, func):
+        """Reset the state of the sequence for a function and trigger its hook."""
+        self.current_function = func.__name__
+        self.function_status = None
+        self.function_counts = (0, 0)
+        self.on_sequence_function_start(self)
+
+    def _end_sequence_function(self, status):
+        """Set the status of the current function and trigger its hook.
+
+        The hook is also triggered for functions that failed, the messages
+        logged by the function are flushed to the log file.
+        """
+        self.logger.flush()
+        self.function_status = status
+        self.on_sequence_function_end(self)
+
+    def _profiled(self, func):
+        """Profile a function run by workers in the current sequence function."""
+        if self.profiler is None:
+            return func
+
+        return self.profiler.wrap(func)
+
+    def _run_sequence_function(self, func, *args):
+        """Run a sequence function between its hooks."""
+        self._start_sequence_function(func)
+        try:
+            return_value = func(*args)
+        except Exception:
+            self._end_sequence_function('FAILED')
+            raise
+
+        self._end_sequence_function('SUCCESS')
+        return return_value
+
     def update_order(self):
         """Update the order of sequence functions in sequence dict."""
         self.sequence_dict = OrderedDict(sorted(self.sequence_dict.items()))
@@ -280,15 +365,18 @@ class IOSequence(Sequence):
 
     def __init__(self, sequence_name='IO_Sequence', order_dict=None,
                  root_dir=None, ignore_dirs=None, num_cores=None,
-                 terminal_log=False, env='UI'):
+                 parent_manifest=None, pool='threads', compression=None,
+                 gitignore=True, terminal_log=False, env='UI', metrics=None,
+                 profiler=None):
         """Initialize the IO sequence class.
 
         Default execution sequence is:
         1. Walk through the root directory
-        2. Group files by extension
-        3. Map readers based on extension
-        4. Read files
-        5. Encrypt the files
+        2. Detect the files that changed since the parent checkpoint
+        3. Group files by extension
+        4. Map readers based on extension
+        5. Read files
+        6. Encrypt the files
 
         Parameters
         ----------
@@ -302,11 +390,28 @@ class IOSequence(Sequence):
             List of directories to be ignored.
         num_cores: int, optional
             Number of cores to be used for parallel processing.
+        parent_manifest: dict, optional
+            Manifest of the parent checkpoint, files whose stat did not
+            change since the parent are carried over without being read.
+        pool: str, optional
+            Pool of workers used to encrypt the files.
+            Possible values are 'threads' or 'processes'.
+        compression: str, optional
+            Codec used to compress the files before encryption, files
+            that are already compressed are stored as is.
+        gitignore: bool, optional
+            If False, the rules of `.gitignore` files are not applied,
+            only the ones of `.checkpointignore` files are.
         terminal_log: bool, optional
             If True, messages will be logged to the terminal
+        metrics: :class: `checkpoint.metrics.SequenceMetrics`, optional
+            Metrics recording the cost of every sequence function.
+        profiler: :class: `checkpoint.profiling.StageProfiler`, optional
+            Profiler of every sequence function, including its workers.
         """
         self.default_order_dict = {
-            'seq_walk_directories': 4,
+            'seq_walk_directories': 5,
+            'seq_detect_changes': 4,
             'seq_group_files': 3,
             'seq_map_readers': 2,
             'seq_read_files': 1,
@@ -315,13 +420,36 @@ class IOSequence(Sequence):
 
         super(IOSequence, self).__init__(sequence_name,
                                          order_dict or self.default_order_dict,
-                                         terminal_log=terminal_log, env=env)
+                                         terminal_log=terminal_log, env=env,
+                                         metrics=metrics, profiler=profiler)
 
         self.root_dir = root_dir or os.getcwd()
         self.ignore_dirs = ignore_dirs or []
         self.ignore_dirs.append('.checkpoint')
-        self.io = IO(self.root_dir, ignore_dirs=self.ignore_dirs)
+        self.gitignore = gitignore
+        ignore_files = [ignore_file for ignore_file in IGNORE_FILES
+                        if self.gitignore or ignore_file != '.gitignore']
+        self.io = IO(self.root_dir, ignore_dirs=self.ignore_dirs,
+                     ignore_files=ignore_files)
         self.num_cores = num_cores or cpu_count()
+        self.parent_manifest = parent_manifest or {}
+        self.pool = pool
+        self.compression = compression
+
+        if self.pool not in ['threads', 'processes']:
+            raise ValueError(f'{self.pool} is an invalid pool')
+        get_codec_id(self.compression)
+
+        #: Files of the walked directories
+        self.directory2files = {}
+        #: Stat index of all the walked files
+        self.index = {}
+        #: Files carried over from the parent checkpoint
+        self.unchanged = {}
+        #: Files that are too large to be read into memory
+        self.large_files = []
+        #: Mode of all the walked files
+        self.modes = {}
 
     def seq_walk_directories(self):
         """Walk through all directories in the root directory.
@@ -338,8 +466,60 @@ class IOSequence(Sequence):
             else:
                 directory2files[root] = [os.path.join(root, file)]
 
+        self.directory2files = directory2files
+        self.count(files=sum(len(files) for files in directory2files.values()))
         return directory2files
 
+    def seq_detect_changes(self, directory2files):
+        """Detect the files that changed since the parent checkpoint.
+
+        A file is considered unchanged if its (size, mtime_ns, inode)
+        matches the index of the parent checkpoint, such files are carried
+        over by reference and dropped from the rest of the sequence.
+
+        Parameters
+        ----------
+        directory2files: dict
+            Dictionary of directory names and their files.
+
+        Returns
+        -------
+        dict
+            Dictionary of directory names and their changed files.
+        """
+        self.index.clear()
+        self.unchanged.clear()
+        self.modes.clear()
+
+        parent_files = self.parent_manifest.get('files', {})
+        parent_index = self.parent_manifest.get('index', {})
+        # Files modified in the same clock tick the parent was created in
+        # can have a matching stat with a different content, re-read them.
+        parent_timestamp = self.parent_manifest.get('timestamp', 0)
+
+        changed = {}
+        for root, files in directory2files.items():
+            for file in files:
+                stat = os.stat(file)
+                self.index[file] = [stat.st_size,
+                                    stat.st_mtime_ns, stat.st_ino]
+                self.modes[file] = stat.st_mode
+
+                if (self.index[file] == parent_index.get(file) and
+                        stat.st_mtime_ns < parent_timestamp and
+                        file in parent_files):
+                    self.unchanged[file] = parent_files[file]
+                else:
+                    changed.setdefault(root, []).append(file)
+
+        self.count(files=len(self.index))
+        if self.parent_manifest:
+            _msg = (f'{len(self.unchanged)} unchanged, '
+                    f'{len(self.index) - len(self.unchanged)} changed files')
+            self.log(_msg, timestamp=True, log_type="INFO")
+
+        return changed
+
     def seq_group_files(self, directory2files):
         """Group files in the same directory.
 
@@ -365,6 +545,9 @@ class IOSequence(Sequence):
     def seq_map_readers(self, extensions_dict):
         """Map the extensions to their respective Readers.
 
+        Extensions without a default reader are mapped to the text or the
+        byte reader depending on the content of their files.
+
         Parameters
         ----------
         extensions_dict: dict
@@ -377,37 +560,9 @@ class IOSequence(Sequence):
         """
         _readers = {}
         unavailabe_extensions = []
-        for extension, _ in extensions_dict.items():
-            _readers[extension] = get_reader_by_extension(extension)
+        for extension, files in extensions_dict.items():
+            _readers[extension] = get_reader_by_extension(extension, files)
             if not _readers[extension]:
-                # all_readers = get_all_readers()
-                # with InTemporaryDirectory() as temp_dir:
-                #     temp_file = os.path.join(temp_dir, f'temp.{extension}')
-                #     self.io.write(temp_file, 'w+', 'test content')
-                #     selected_reader = None
-                #     for reader in all_readers:
-                #         try:
-                #             _msg = f'Trying {reader.__name__} for extension {extension}'
-                #             self.log(
-                #                 _msg, colors=LogColors.BOLD, log_caller=True, log_type="INFO")
-                #             reader = reader()
-                #             reader.read(temp_file, validate=False)
-                #             selected_reader = reader
-                #         except Exception:
-                #             selected_reader = None
-                #             continue
-
-                #     if selected_reader:
-                #         _msg = f'{selected_reader.__class__.__name__} selected'
-                #         self.log(
-                #             _msg, colors=LogColors.SUCCESS, timestamp=True, log_type="SUCCESS")
-                #         _readers[extension] = selected_reader
-                #     else:
-                #         unavailabe_extensions.append(extension)
-                #         del _readers[extension]
-                #         self.log(
-                #             f'No reader found for extension {extension}, skipping',
-                #             colors=LogColors.WARNING, log_caller=True, log_type="WARNING")
                 self.log(
                     f'No reader found for extension {extension}, skipping',
                     colors=LogColors.WARNING, log_caller=True, log_type="WARNING")
@@ -431,47 +586,467 @@ class IOSequence(Sequence):
         Returns
         -------
         dict
-            Dictionary of files and their content.
+            Dictionary of files and their raw content.
         """
         readers_dict, extension_dict = readers_extension
 
-        contents = \
-            Parallel(self.num_cores)(delayed(readers_dict[ext].read)(files,
-                                     validate=False) for (ext, files) in
-                                     extension_dict.items())
+        # Large files are streamed into the store by the encryption
+        # phase instead of being read into memory here.
+        self.large_files.clear()
+        for extension, files in extension_dict.items():
+            small_files = []
+            for file in files:
+                if self._file_size(file) > STREAM_THRESHOLD:
+                    self.large_files.append(file)
+                else:
+                    small_files.append(file)
+            extension_dict[extension] = small_files
+
+        # Files are read as raw bytes, these are carried to the encryption
+        # phase so that every file is read from the disk exactly once.
+        # Raw reads are bound by IO and run in threads, which also avoids
+        # pickling the files to worker processes.
+        contents = Parallel(self.num_cores, backend='threading')(
+            delayed(self._profiled(reader.read))(files, validate=False, raw=True)
+            for reader, files in self._read_batches(readers_dict, extension_dict))
+
+        self.count(files=sum(len(content) for content in contents),
+                   nbytes=sum(len(file_content) for content in contents
+                              for obj in content for file_content in obj.values()))
         return contents
 
+    def _read_batches(self, readers_dict, extension_dict):
+        """Split the files into batches of roughly equal cost.
+
+        Every file costs its size plus a fixed overhead, batches are sized
+        so that every worker gets several of them and no worker is left
+        with a whole extension group.
+
+        Parameters
+        ----------
+        readers_dict: dict
+            Dictionary of extensions and their Readers.
+        extension_dict: dict
+            Dictionary of extensions and their files.
+
+        Returns
+        -------
+        list
+            List of readers and the batch of files they should read.
+        """
+        weights = {extension: [self._file_size(file) + BATCH_FILE_OVERHEAD
+                               for file in files]
+                   for extension, files in extension_dict.items()}
+        total_weight = sum(sum(weight) for weight in weights.values())
+        max_weight = max(1, total_weight // (self.num_cores * BATCHES_PER_WORKER))
+
+        batches = []
+        for extension, files in extension_dict.items():
+            for batch in split_batches(files, weights[extension], max_weight):
+                batches.append((readers_dict[extension], batch))
+
+        return batches
+
     def seq_encrypt_files(self, contents):
         """Encrypt the read files.
 
         Parameters
         ----------
-        contents: dict
-            Dictionary of file paths and their content.
+        contents: list
+            Raw contents of the files, grouped by extension.
 
         Returns
         -------
         dict
-            Dictionary of file paths and their encrypted content.
+            Dictionary of file paths and the digests of their objects
+            in the object store.
         """
-        # TODO: Parallelize this
-        path2content = {}
-        crypt_obj = Crypt(key='crypt.key', key_path=os.path.join(
-            self.root_dir, '.checkpoint'))
+        path2content = dict(self.unchanged)
+        store = self._open_store()
+
+        files = [item for content in contents for obj in content
+                 for item in obj.items()]
+        weights = [len(file_content) + BATCH_FILE_OVERHEAD
+                   for _, file_content in files]
+        max_weight = max(1, sum(weights) // (self.num_cores * BATCHES_PER_WORKER))
+        batches = split_batches(files, weights, max_weight)
+        self.count(files=len(files) + len(self.large_files),
+                   nbytes=sum(len(file_content) for _, file_content in files) +
+                   sum(self._file_size(path) for path in self.large_files))
+
+        store.open_pack()
+        try:
+            # Batches are collected in order, the mapping does not depend
+            # on the order in which the workers finish
+            for batch in self._encrypt_batches(store, batches):
+                path2content.update(batch)
+
+            for path in self.large_files:
+                path2content[path] = store.put_file(
+                    path, codec=select_codec(path, self.compression))
+        finally:
+            store.close_pack()
+
+        return path2content
+
+    def _encrypt_batches(self, store, batches):
+        """Encrypt batches of files into the object store in parallel.
+
+        Parameters
+        ----------
+        store: :class: `checkpoint.store.ObjectStore`
+            Object store with an open pack.
+        batches: list
+            Batches of file paths and their raw content.
+
+        Yields
+        ------
+        list of tuple
+            File paths and the digests of their objects, batch by batch
+            in the order of `batches`.
+        """
+        def _put_batch(batch):
+            return [(path, store.put(content, codec=select_codec(path, self.compression)))
+                    for path, content in batch]
+
+        if len(batches) <= 1 or self.num_cores == 1:
+            for batch in batches:
+                yield _put_batch(batch)
+        elif self.pool == 'processes':
+            # Workers hash, compress and encrypt, only the parent writes to the pack
+            batches = [[(path, content, select_codec(path, self.compression))
+                        for path, content in batch] for batch in batches]
+            with ProcessPoolExecutor(self.num_cores, initializer=_init_store_worker,
+                                     initargs=(self.root_dir,)) as executor:
+                for batch in executor.map(self._profiled(_encrypt_in_worker), batches):
+                    yield [(path, store.put_encrypted(digest, encrypted, flags))
+                           for path, digest, encrypted, flags in batch]
+        else:
+            with ThreadPoolExecutor(self.num_cores) as executor:
+                yield from executor.map(self._profiled(_put_batch), batches)
+
+    def _file_size(self, file):
+        """Get the size of a file, from the stat index if it was walked."""
+        if file in self.index:
+            return self.index[file][0]
+
+        return os.path.getsize(file)
+
+    def _open_store(self):
+        """Open the object store of the root directory."""
+        checkpoint_dir = os.path.join(self.root_dir, '.checkpoint')
+        crypt_obj = Crypt(key='crypt.key', key_path=checkpoint_dir)
+        return ObjectStore(checkpoint_dir, crypt_obj)
+
+
+class StreamingIOSequence(IOSequence):
+    """Class to represent a sequence of IO operations that streams file contents.
+
+    Files are read by a pool of threads and handed over to the encryption
+    phase one at a time through a bounded queue. The amount of file content
+    held in memory never exceeds `max_inflight_bytes` (except for a single
+    file that is larger than the budget), so the peak memory is independent
+    of the size of the repository.
+    """
+
+    def __init__(self, sequence_name='Streaming_IO_Sequence', order_dict=None,
+                 root_dir=None, ignore_dirs=None, num_cores=None,
+                 parent_manifest=None, max_inflight_bytes=None,
+                 compression=None, gitignore=True, terminal_log=False, env='UI',
+                 metrics=None, profiler=None):
+        """Initialize the streaming IO sequence class.
+
+        Parameters
+        ----------
+        sequence_name: str
+            Name of the sequence.
+        order_dict: dict, optional
+            Dictionary of function names and their order in the sequence.
+        root_dir: str, optional
+            The root directory.
+        ignore_dirs: list of str, optional
+            List of directories to be ignored.
+        num_cores: int, optional
+            Number of threads used to read the files.
+        parent_manifest: dict, optional
+            Manifest of the parent checkpoint, files whose stat did not
+            change since the parent are carried over without being read.
+        max_inflight_bytes: int, optional
+            Maximum number of bytes of file content held in memory.
+        compression: str, optional
+            Codec used to compress the files before encryption.
+        gitignore: bool, optional
+            If False, the rules of `.gitignore` files are not applied.
+        terminal_log: bool, optional
+            If True, messages will be logged to the terminal
+        metrics: :class: `checkpoint.metrics.SequenceMetrics`, optional
+            Metrics recording the cost of every sequence function.
+        profiler: :class: `checkpoint.profiling.StageProfiler`, optional
+            Profiler of every sequence function, including its workers.
+        """
+        super(StreamingIOSequence, self).__init__(
+            sequence_name, order_dict, root_dir=root_dir,
+            ignore_dirs=ignore_dirs, num_cores=num_cores,
+            parent_manifest=parent_manifest, compression=compression,
+            gitignore=gitignore, terminal_log=terminal_log, env=env, metrics=metrics,
+            profiler=profiler)
+
+        self.max_inflight_bytes = max_inflight_bytes or DEFAULT_INFLIGHT_BYTES
+
+    def seq_read_files(self, readers_extension):
+        """Lazily read the gathered files using their respective reader.
+
+        Parameters
+        ----------
+        readers_extension: list
+            Readers dict and extensions dict packed in a list.
+
+        Returns
+        -------
+        generator
+            Generator of file paths and their raw content.
+        """
+        readers_dict, extension_dict = readers_extension
+        tasks = SimpleQueue()
+        for extension, files in extension_dict.items():
+            for file in files:
+                tasks.put((readers_dict[extension], file))
+
+        return self._stream_files(tasks)
+
+    def _stream_files(self, tasks):
+        """Read files in worker threads and yield them in the calling thread.
+
+        Parameters
+        ----------
+        tasks: :class: `queue.SimpleQueue`
+            Queue of readers and the files they should read.
+
+        Yields
+        ------
+        tuple
+            File path and its raw content, the content is None
+            for files larger than `STREAM_THRESHOLD`.
+        """
+        budget = ByteBudget(self.max_inflight_bytes)
+        results = Queue(maxsize=2 * self.num_cores)
+        _done = object()
+
+        def _read_worker():
+            while not budget.closed:
+                try:
+                    reader, file = tasks.get_nowait()
+                except Empty:
+                    break
+
+                size = self._file_size(file)
+                if size > STREAM_THRESHOLD:
+                    # Streamed into the store chunk by chunk by the consumer
+                    results.put((file, None, 0))
+                    continue
+
+                if not budget.acquire(size):
+                    break
+
+                try:
+                    content = reader.read(file, validate=False, raw=True)[0]
+                except Exception as e:
+                    budget.release(size)
+                    results.put(e)
+                    break
+
+                results.put((file, content[file], size))
+
+            results.put(_done)
+
+        workers = [Thread(target=self._profiled(_read_worker), daemon=True)
+                   for _ in range(self.num_cores)]
+        for worker in workers:
+            worker.start()
+
+        finished = 0
+        try:
+            while finished < len(workers):
+                result = results.get()
+                if result is _done:
+                    finished += 1
+                    continue
+                if isinstance(result, Exception):
+                    raise result
+
+                file, content, size = result
+                del result
+                try:
+                    yield file, content
+                finally:
+                    del content
+                    budget.release(size)
+        finally:
+            # Unblock the workers if the consumer stopped early
+            budget.close()
+            while any(worker.is_alive() for worker in workers):
+                try:
+                    results.get(timeout=0.1)
+                except Empty:
+                    pass
+
+    def seq_encrypt_files(self, contents):
+        """Encrypt the streamed files into the object store.
 
-        for content in contents:
-            for obj in content:
-                path = list(obj.keys())[0]
-                path2content[path] = crypt_obj.encrypt(path)
+        Parameters
+        ----------
+        contents: generator
+            Generator of file paths and their raw content, the content
+            is None for files that are to be streamed from the disk.
+
+        Returns
+        -------
+        dict
+            Dictionary of file paths and the digests of their objects
+            in the object store.
+        """
+        path2content = dict(self.unchanged)
+        store = self._open_store()
+
+        store.open_pack()
+        try:
+            for path, content in contents:
+                codec = select_codec(path, self.compression)
+                if content is None:
+                    path2content[path] = store.put_file(path, codec=codec)
+                    self.count(files=1, nbytes=self._file_size(path))
+                else:
+                    path2content[path] = store.put(content, codec=codec)
+                    self.count(files=1, nbytes=len(content))
+        finally:
+            store.close_pack()
 
         return path2content
 
 
+# Object store of the worker processes used to create and restore checkpoints
+_worker_store = None
+
+
+def _init_store_worker(root_dir):
+    """Open the object store of the root directory in a worker process.
+
+    Parameters
+    ----------
+    root_dir: str
+        The root directory.
+    """
+    global _worker_store
+    checkpoint_dir = os.path.join(root_dir, '.checkpoint')
+    _worker_store = ObjectStore(checkpoint_dir,
+                                Crypt(key='crypt.key', key_path=checkpoint_dir))
+
+
+def _encrypt_in_worker(batch):
+    """Hash, compress and encrypt file contents using the key of the worker process.
+
+    Parameters
+    ----------
+    batch: list of tuple
+        File paths, their raw content and the codec to compress it with.
+
+    Returns
+    -------
+    list of tuple
+        File paths, the digests of their content, the encrypted chunks
+        and the id of the codec.
+    """
+    encrypted = []
+    for path, content, codec in batch:
+        digest = _worker_store.hash(content)
+        content, flags = compress(content, codec)
+        encrypted.append((path, digest,
+                          list(_worker_store.crypt.encrypt_stream(content)), flags))
+
+    return encrypted
+
+
+def _is_restored(store, file, digest, stat_index, timestamp):
+    """Check if a file on the disk already has the content of its object.
+
+    Parameters
+    ----------
+    store: :class: `checkpoint.store.ObjectStore`
+        Object store that holds the objects.
+    file: str
+        Path to the file.
+    digest: str
+        Digest of the object of the file.
+    stat_index: list or None
+        (size, mtime_ns, inode) of the file when the checkpoint was created.
+    timestamp: int
+        Time at which the checkpoint was created.
+    """
+    try:
+        stat = os.stat(file)
+    except FileNotFoundError:
+        return False
+
+    if stat_index:
+        if stat.st_size != stat_index[0]:
+            return False
+
+        # Untouched since the checkpoint was created, no need to hash it
+        if ([stat.st_size, stat.st_mtime_ns, stat.st_ino] == stat_index and
+                stat.st_mtime_ns < timestamp):
+            return True
+
+    return store.hash_file(file) == digest
+
+
+def _restore_files(store, file2digest, differential=False, timestamp=0):
+    """Decrypt objects from the store and write them to their files.
+
+    Parameters
+    ----------
+    store: :class: `checkpoint.store.ObjectStore`
+        Object store that holds the objects.
+    file2digest: list of tuple
+        File paths, the digests of their objects and their stat index.
+    differential: bool, optional
+        If True, files that already have the content of their object
+        are not written.
+    timestamp: int, optional
+        Time at which the checkpoint was created.
+
+    Returns
+    -------
+    list
+        Paths of the restored files.
+    """
+    _io = IO(path=store.path, mode='a')
+    restored = []
+    for file, digest, stat_index in file2digest:
+        if differential and _is_restored(store, file, digest, stat_index, timestamp):
+            continue
+
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with _io.open(file, 'wb+') as f:
+            for chunk in store.iter_content(digest):
+                f.write(chunk)
+        restored.append(file)
+
+    return restored
+
+
+def _restore_files_in_worker(file2digest, differential=False, timestamp=0):
+    """Restore files using the object store of the worker process."""
+    return _restore_files(_worker_store, file2digest, differential, timestamp)
+
+
 class CheckpointSequence(Sequence):
     """Sequence to perform checkpoint operations."""
 
     def __init__(self, sequence_name, order_dict, root_dir, ignore_dirs,
-                 terminal_log=False, env='UI'):
+                 incremental=False, streaming=False, max_inflight_bytes=None,
+                 num_cores=None, pool='threads', compression=None,
+                 differential=False, only=None, gitignore=True, terminal_log=False,
+                 env='UI', metrics=None, profiler=None):
         """Initialize the CheckpointSequence class.
 
         Parameters
@@ -484,15 +1059,60 @@ class CheckpointSequence(Sequence):
             The root directory.
         ignore_dirs: list of str
             List of directories to be ignored.
+        incremental: bool, optional
+            If True, only the files that changed since the current
+            checkpoint are read and encrypted on creation.
+        streaming: bool, optional
+            If True, files are streamed into the object store on creation
+            instead of being gathered in memory first.
+        max_inflight_bytes: int, optional
+            Maximum number of bytes of file content held in memory
+            while streaming.
+        num_cores: int, optional
+            Number of workers used for parallel processing.
+        pool: str, optional
+            Pool of workers used to encrypt files on creation and to
+            restore checkpoints. Possible values are 'threads' or 'processes'.
+        compression: str, optional
+            Codec used to compress the files before encryption on creation.
+            Possible values are 'zlib', 'lzma' or 'zstd'.
+        differential: bool, optional
+            If True, only the files that differ from the checkpoint
+            are rewritten on restoration.
+        only: list of str, optional
+            Glob patterns or directories (relative to the root directory),
+            only the matching files are restored.
+        gitignore: bool, optional
+            If False, the rules of `.gitignore` files are not applied on
+            creation, only the ones of `.checkpointignore` files are.
         terminal_log: bool, optional
             If True, messages will be logged to the terminal
+        metrics: :class: `checkpoint.metrics.SequenceMetrics`, optional
+            Metrics recording the cost of every sequence function, the
+            sequences executed on creation are recorded too.
+        profiler: :class: `checkpoint.profiling.StageProfiler`, optional
+            Profiler of every sequence function, including its workers and
+            the sequences executed on creation.
         """
         self.sequence_name = sequence_name
         self.order_dict = order_dict
         self.root_dir = root_dir
         self.ignore_dirs = ignore_dirs
+        self.incremental = incremental
+        self.streaming = streaming
+        self.max_inflight_bytes = max_inflight_bytes
+        self.num_cores = num_cores or cpu_count()
+        self.pool = pool
+        self.compression = compression
+        self.differential = differential
+        self.only = only or []
+        self.gitignore = gitignore
+
+        if self.pool not in ['threads', 'processes']:
+            raise ValueError(f'{self.pool} is an invalid pool')
         super(CheckpointSequence, self).__init__(sequence_name, order_dict,
-                                                 terminal_log=terminal_log, env=env)
+                                                 terminal_log=terminal_log, env=env,
+                                                 metrics=metrics, profiler=profiler)
 
     def _validate_checkpoint(self):
         """Validate if a checkpoint is valid."""
@@ -501,6 +1121,26 @@ class CheckpointSequence(Sequence):
         if not os.path.isdir(checkpoint_path):
             raise ValueError(f'Checkpoint {self.sequence_name} does not exist')
 
+    def _load_checkpoint(self, checkpoint_name):
+        """Load the manifest of a checkpoint.
+
+        Parameters
+        ----------
+        checkpoint_name: str
+            Name of the checkpoint.
+
+        Returns
+        -------
+        dict
+            Checkpoint manifest, checkpoints created before the object
+            store map file paths directly to their encrypted content.
+        """
+        checkpoint_path = os.path.join(self.root_dir, '.checkpoint',
+                                       checkpoint_name, f'{checkpoint_name}.json')
+
+        with open(checkpoint_path, 'r') as checkpoint_file:
+            return json.load(checkpoint_file)
+
     def seq_init_checkpoint(self):
         """Initialize the checkpoint directory."""
         _io = IO(path=self.root_dir, mode="a",
@@ -528,9 +1168,39 @@ class CheckpointSequence(Sequence):
         _io = IO(path=self.root_dir, mode="a",
                  ignore_dirs=self.ignore_dirs)
 
-        _io_sequence = IOSequence(root_dir=self.root_dir,
-                                  ignore_dirs=self.ignore_dirs,
-                                  terminal_log=self.terminal_log, env=self.env)
+        config_path = os.path.join(self.root_dir, '.checkpoint', '.config')
+
+        parent_manifest = None
+        if self.incremental:
+            with open(config_path, 'r') as config_file:
+                current_checkpoint = json.load(config_file)['current_checkpoint']
+
+            if current_checkpoint:
+                parent_manifest = self._load_checkpoint(current_checkpoint)
+                if parent_manifest.get('store') != STORE_FORMAT:
+                    parent_manifest = None
+
+        timestamp = time_ns()
+        if self.streaming:
+            _io_sequence = StreamingIOSequence(root_dir=self.root_dir,
+                                               ignore_dirs=self.ignore_dirs,
+                                               num_cores=self.num_cores,
+                                               parent_manifest=parent_manifest,
+                                               max_inflight_bytes=self.max_inflight_bytes,
+                                               compression=self.compression,
+                                               gitignore=self.gitignore,
+                                               terminal_log=self.terminal_log, env=self.env,
+                                               metrics=self.metrics, profiler=self.profiler)
+        else:
+            _io_sequence = IOSequence(root_dir=self.root_dir,
+                                      ignore_dirs=self.ignore_dirs,
+                                      num_cores=self.num_cores,
+                                      parent_manifest=parent_manifest,
+                                      pool=self.pool,
+                                      compression=self.compression,
+                                      gitignore=self.gitignore,
+                                      terminal_log=self.terminal_log, env=self.env,
+                                      metrics=self.metrics, profiler=self.profiler)
 
         enc_files = _io_sequence.execute_sequence(pass_args=True)[-1]
 
@@ -540,10 +1210,22 @@ class CheckpointSequence(Sequence):
         checkpoint_file_path = os.path.join(
             checkpoint_path, f'{self.sequence_name}.json')
 
-        config_path = os.path.join(self.root_dir, '.checkpoint', '.config')
-
+        manifest = {
+            'store': STORE_FORMAT,
+            'timestamp': timestamp,
+            'files': enc_files,
+            'index': {file: _io_sequence.index[file] for file in enc_files},
+        }
         with open(checkpoint_file_path, 'w+') as checkpoint_file:
-            json.dump(enc_files, checkpoint_file, indent=4)
+            json.dump(manifest, checkpoint_file)
+        self.count(files=len(enc_files),
+                   nbytes=sum(size for size, _, _ in manifest['index'].values()))
+
+        write_manifest(self._manifest_path(self.sequence_name), [
+            ManifestEntry(self._relative_path(file), _io_sequence.index[file][0],
+                          _io_sequence.index[file][1], _io_sequence.modes[file],
+                          _io_sequence.index[file][2], digest)
+            for file, digest in enc_files.items()], timestamp=timestamp)
 
         with open(config_path, 'r') as config_file:
             checkpoint_config = json.load(config_file)
@@ -553,15 +1235,9 @@ class CheckpointSequence(Sequence):
         with open(config_path, 'w+') as config_file:
             json.dump(checkpoint_config, config_file, indent=4)
 
-        root2file = {}
-        for root, file in _io.walk_directory():
-            if root in root2file:
-                root2file[root].append(os.path.join(root, file))
-            else:
-                root2file[root] = [os.path.join(root, file)]
-
+        # The metadata comes from the same walk as the checkpointed files
         with open(os.path.join(checkpoint_path, '.metadata'), 'w+') as metadata_file:
-            json.dump(root2file, metadata_file, indent=4)
+            json.dump(_io_sequence.directory2files, metadata_file, indent=4)
 
     def seq_delete_checkpoint(self):
         """Delete the checkpoint for the target directory."""
@@ -586,32 +1262,230 @@ class CheckpointSequence(Sequence):
 
         _io.delete_dir(checkpoint_path)
 
+        # Objects are shared between checkpoints, only the ones that
+        # are no longer referenced by any checkpoint can be removed.
+        referenced = set()
+        for checkpoint_name in checkpoint_config['checkpoints']:
+            manifest = self._load_checkpoint(checkpoint_name)
+            if manifest.get('store') == STORE_FORMAT:
+                referenced.update(manifest['files'].values())
+
+        _key = os.path.join(self.root_dir, '.checkpoint')
+        store = ObjectStore(_key, Crypt(key='crypt.key', key_path=_key))
+        store.prune(referenced)
+
     def seq_restore_checkpoint(self):
-        """Restore back to a specific checkpoint."""
+        """Restore back to a specific checkpoint.
+
+        Returns
+        -------
+        dict
+            Paths of the restored files and of the files that were
+            skipped because they already matched the checkpoint.
+        """
         self._validate_checkpoint()
         _io = IO(path=self.root_dir, mode="a",
                  ignore_dirs=self.ignore_dirs)
         _key = os.path.join(self.root_dir, '.checkpoint')
         crypt = Crypt(key='crypt.key', key_path=_key)
 
-        checkpoint_path = os.path.join(self.root_dir, '.checkpoint',
-                                       self.sequence_name, f'{self.sequence_name}.json')
-
         config_path = os.path.join(self.root_dir, '.checkpoint', '.config')
+        manifest_path = self._manifest_path(self.sequence_name)
+        if os.path.isfile(manifest_path):
+            checkpoint_dict = self._load_manifest(manifest_path)
+        else:
+            checkpoint_dict = self._load_checkpoint(self.sequence_name)
+            if self.only and checkpoint_dict.get('store') == STORE_FORMAT:
+                checkpoint_dict = dict(
+                    checkpoint_dict, files=self._select_files(checkpoint_dict['files']))
+            elif self.only:
+                checkpoint_dict = self._select_files(checkpoint_dict)
+
+        if not self.only:
+            # A partial restore does not bring the tree back to the checkpoint
+            with open(config_path, 'r') as config_file:
+                checkpoint_config = json.load(config_file)
+                checkpoint_config['current_checkpoint'] = self.sequence_name
+
+            with open(config_path, 'w+') as config_file:
+                json.dump(checkpoint_config, config_file, indent=4)
+
+        if checkpoint_dict.get('store') == STORE_FORMAT:
+            store = ObjectStore(_key, crypt)
+            restored = self._restore_files(store, checkpoint_dict)
+        else:
+            restored = []
+            for file, content in checkpoint_dict.items():
+                content = crypt.decrypt(content)
+                _io.write(file, 'wb+', content)
+                restored.append(file)
+
+        files = checkpoint_dict.get('files', checkpoint_dict)
+        index = checkpoint_dict.get('index', {})
+        self.count(files=len(restored),
+                   nbytes=sum(index[file][0] for file in restored if file in index))
+        restored_set = set(restored)
+        report = {
+            'restored': restored,
+            'skipped': [file for file in files if file not in restored_set],
+        }
 
-        with open(checkpoint_path, 'r') as checkpoint_file:
-            checkpoint_dict = json.load(checkpoint_file)
+        _msg = (f'{len(report["restored"])} files restored, '
+                f'{len(report["skipped"])} files already up to date')
+        self.log(_msg, timestamp=True, log_type="INFO")
 
-        with open(config_path, 'r') as config_file:
-            checkpoint_config = json.load(config_file)
-            checkpoint_config['current_checkpoint'] = self.sequence_name
+        return report
 
-        with open(config_path, 'w+') as config_file:
-            json.dump(checkpoint_config, config_file, indent=4)
+    def _select_files(self, files):
+        """Select the files that match the `only` filters.
+
+        A filter matches a file if it is a glob pattern that matches the path
+        of the file relative to the root directory, or if it is one of the
+        directories the file is in.
+
+        Parameters
+        ----------
+        files: dict
+            Dictionary of file paths and their content.
+
+        Returns
+        -------
+        dict
+            Dictionary of the matching file paths and their content.
+        """
+        patterns = self._only_patterns()
+
+        selected = {}
+        for file, content in files.items():
+            rel_path = self._relative_path(file)
+            for pattern in patterns:
+                if (fnmatch(rel_path, pattern) or
+                        rel_path.startswith(f'{pattern}/')):
+                    selected[file] = content
+                    break
+
+        return selected
+
+    def _select_entries(self, manifest):
+        """Select the entries of a manifest that match the `only` filters.
+
+        Directories and plain paths are looked up with a binary search,
+        only glob patterns go through all the entries.
+
+        Parameters
+        ----------
+        manifest: :class: `checkpoint.manifest.Manifest`
+            Manifest of the checkpoint.
+
+        Returns
+        -------
+        list
+            Matching entries of the manifest.
+        """
+        selected = {}
+        for pattern in self._only_patterns():
+            if any(char in pattern for char in '*?['):
+                entries = [entry for entry in manifest if fnmatch(entry.path, pattern)]
+            else:
+                entries = list(manifest.iter_prefix(f'{pattern}/'))
+                entry = manifest.get(pattern)
+                if entry:
+                    entries.append(entry)
+
+            for entry in entries:
+                selected[entry.path] = entry
+
+        return [selected[path] for path in sorted(selected)]
+
+    def _only_patterns(self):
+        """Normalize the `only` filters to relative paths with `/` as the separator."""
+        return [pattern.replace(os.sep, '/').strip('/') for pattern in self.only]
+
+    def _relative_path(self, file):
+        """Get the path of a file relative to the root directory with `/` as the separator."""
+        return os.path.relpath(file, self.root_dir).replace(os.sep, '/')
+
+    def _manifest_path(self, checkpoint_name):
+        """Get the path to the binary manifest of a checkpoint."""
+        return os.path.join(self.root_dir, '.checkpoint', checkpoint_name,
+                            f'{checkpoint_name}.manifest')
+
+    def _load_manifest(self, manifest_path):
+        """Load the files of a binary manifest, filtered by `only`.
+
+        Parameters
+        ----------
+        manifest_path: str
+            Path to the binary manifest.
+
+        Returns
+        -------
+        dict
+            Checkpoint manifest, in the same layout as the JSON manifest.
+        """
+        with Manifest(manifest_path) as manifest:
+            entries = self._select_entries(manifest) if self.only else list(manifest)
+            timestamp = manifest.timestamp
+
+        files = {}
+        index = {}
+        for entry in entries:
+            file = os.path.join(self.root_dir, *entry.path.split('/'))
+            files[file] = entry.digest
+            index[file] = [entry.size, entry.mtime_ns, entry.ino]
+
+        return {'store': STORE_FORMAT, 'timestamp': timestamp,
+                'files': files, 'index': index}
+
+    def _restore_files(self, store, manifest):
+        """Restore files from the object store using a pool of workers.
+
+        Files are split into batches to amortize the dispatch overhead,
+        the progress is reported as the batches finish.
+
+        Parameters
+        ----------
+        store: :class: `checkpoint.store.ObjectStore`
+            Object store that holds the objects.
+        manifest: dict
+            Manifest of the checkpoint.
+
+        Returns
+        -------
+        list
+            Paths of the restored files.
+        """
+        index = manifest.get('index', {})
+        timestamp = manifest.get('timestamp', 0)
+        items = [(file, digest, index.get(file))
+                 for file, digest in manifest['files'].items()]
+        batch_size = max(1, len(items) // (self.num_cores * 4))
+        batches = [items[idx:idx + batch_size]
+                   for idx in range(0, len(items), batch_size)]
+
+        _task_id = Sequence._progress.add_task(
+            description='Restoring Files', total=len(items))
+
+        if self.pool == 'processes':
+            executor = ProcessPoolExecutor(self.num_cores,
+                                           initializer=_init_store_worker,
+                                           initargs=(self.root_dir,))
+            futures = {executor.submit(self._profiled(_restore_files_in_worker), batch,
+                                       self.differential, timestamp): len(batch)
+                       for batch in batches}
+        else:
+            executor = ThreadPoolExecutor(self.num_cores)
+            futures = {executor.submit(self._profiled(_restore_files), store, batch,
+                                       self.differential, timestamp): len(batch)
+                       for batch in batches}
+
+        restored = []
+        with executor:
+            for future in as_completed(futures):
+                restored.extend(future.result())
+                Sequence._progress.update(_task_id, advance=futures[future])
 
-        for file, content in checkpoint_dict.items():
-            content = crypt.decrypt(content)
-            _io.write(file, 'wb+', content)
+        return restored
 
     def seq_version(self):
         """Print the version of the sequence."""
@@ -623,7 +1497,8 @@ class CLISequence(Sequence):
     """Sequence for the CLI environment."""
 
     def __init__(self, sequence_name='CLI_Sequence', order_dict=None,
-                 arg_parser=None, args=None, terminal_log=False, env='UI'):
+                 arg_parser=None, args=None, terminal_log=False, env='UI',
+                 metrics=None, profiler=None):
         """Initialize the CLISequence class.
 
         Default execution sequence is:
@@ -640,6 +1515,10 @@ class CLISequence(Sequence):
             Dictionary of the order of the functions in the sequence.
         arg_parser: ArgumentParser
             Argument parser for the CLI.
+        metrics: :class: `checkpoint.metrics.SequenceMetrics`, optional
+            Metrics recording the cost of every sequence function.
+        profiler: :class: `checkpoint.profiling.StageProfiler`, optional
+            Profiler of every sequence function.
         """
         self.default_order_dict = {
             'seq_parse_args': 2,
@@ -650,7 +1529,8 @@ class CLISequence(Sequence):
         self.arg_parser = arg_parser
         super(CLISequence, self).__init__(sequence_name=sequence_name,
                                           order_dict=order_dict or self.default_order_dict,
-                                          terminal_log=terminal_log, env=env)
+                                          terminal_log=terminal_log, env=env,
+                                          metrics=metrics, profiler=profiler)
 
     def seq_parse_args(self):
         """Parse the arguments from the CLI."""
@@ -695,6 +1575,15 @@ class CLISequence(Sequence):
         _name = args.name
         _path = args.path
         _ignore_dirs = args.ignore_dirs or []
+        _incremental = getattr(args, 'incremental', False)
+        _streaming = getattr(args, 'stream', False)
+        _max_inflight_bytes = getattr(args, 'max_inflight_bytes', None)
+        _num_cores = getattr(args, 'num_cores', None)
+        _pool = getattr(args, 'pool', None) or 'threads'
+        _differential = getattr(args, 'differential', False)
+        _only = getattr(args, 'only', None)
+        _compression = getattr(args, 'compression', None)
+        _gitignore = getattr(args, 'gitignore', True)
         _helper_actions = ['seq_init_checkpoint', 'seq_version']
 
         if not (_name and _path) and action not in _helper_actions:
@@ -702,7 +1591,11 @@ class CLISequence(Sequence):
 
         order_dict = {action: 0}
         _checkpoint_sequence = CheckpointSequence(
-            _name, order_dict, _path, _ignore_dirs,
-            terminal_log=self.terminal_log, env=self.env)
+            _name, order_dict, _path, _ignore_dirs, incremental=_incremental,
+            streaming=_streaming, max_inflight_bytes=_max_inflight_bytes,
+            num_cores=_num_cores, pool=_pool, compression=_compression,
+            differential=_differential, only=_only, gitignore=_gitignore,
+            terminal_log=self.terminal_log, env=self.env, metrics=self.metrics,
+            profiler=self.profiler)
         action_function = getattr(_checkpoint_sequence, action)
-        action_function()
+        _checkpoint_sequence._run_sequence_function(action_function)
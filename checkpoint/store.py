@@ -0,0 +1,657 @@
+"""Module that provides a content addressed store for checkpoint data."""
+import hashlib
+import os
+import struct
+import tempfile
+from os.path import isdir, isfile
+from os.path import join as pjoin
+from threading import RLock
+from uuid import uuid4
+
+from checkpoint.compression import (compress, get_codec_id, iter_compress,
+                                    iter_decompress)
+from checkpoint.crypt import STREAM_MAGIC, is_stream, iter_chunks
+from checkpoint.io import IO
+
+#: Name of the directory (inside `.checkpoint`) that holds the objects
+OBJECTS_DIR = 'objects'
+
+#: Name of the directory (inside `objects`) that holds the packs
+PACKS_DIR = 'packs'
+
+#: Value of the `store` key in manifests that reference the object store
+STORE_FORMAT = 'objects'
+
+#: Magic bytes that start and end every pack
+PACK_MAGIC = b'CKPTPACK'
+
+#: Version of the pack format
+PACK_VERSION = 1
+
+# magic, version
+_PACK_HEADER = struct.Struct(f'>{len(PACK_MAGIC)}sB')
+# flags, length of the record data
+_RECORD_HEADER = struct.Struct('>BQ')
+# digest, offset of the record data, length of the record data, flags
+_INDEX_ENTRY = struct.Struct('>32sQQB')
+# offset of the index, number of index entries, magic
+_PACK_FOOTER = struct.Struct(f'>QQ{len(PACK_MAGIC)}s')
+
+
+class _RecordReader:
+    """File like object that reads a single record out of a pack."""
+
+    def __init__(self, file, offset, length):
+        self._file = file
+        self._file.seek(offset)
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+class Pack:
+    """Class to read a pack of encrypted objects.
+
+    A pack is a binary container made of a header, one length-prefixed
+    record per object and an index of the records sorted by digest. The
+    footer points to the index, so any object can be read with a single
+    seek without going through the rest of the pack.
+
+    Attributes
+    ----------
+    path: str
+        Path to the pack
+    entries: dict
+        Dictionary of digests and their (offset, length, flags)
+    """
+
+    def __init__(self, path):
+        """Initialize the Pack class.
+
+        Parameters
+        ----------
+        path: str
+            Path to the pack
+        """
+        self.path = path
+        self.entries = self._read_index()
+
+    def _read_index(self):
+        """Read the index at the end of the pack."""
+        if os.path.getsize(self.path) < _PACK_HEADER.size + _PACK_FOOTER.size:
+            raise ValueError(f'{self.path} is truncated')
+
+        with open(self.path, 'rb') as f:
+            magic, version = _PACK_HEADER.unpack(f.read(_PACK_HEADER.size))
+            if magic != PACK_MAGIC:
+                raise ValueError(f'{self.path} is not a valid pack')
+            if version != PACK_VERSION:
+                raise ValueError(f'Unsupported pack version: {version}')
+
+            f.seek(-_PACK_FOOTER.size, os.SEEK_END)
+            index_offset, num_entries, magic = _PACK_FOOTER.unpack(
+                f.read(_PACK_FOOTER.size))
+            if magic != PACK_MAGIC:
+                raise ValueError(f'{self.path} is truncated')
+
+            f.seek(index_offset)
+            index = f.read(num_entries * _INDEX_ENTRY.size)
+
+        return {digest.hex(): (offset, length, flags) for digest, offset, length, flags
+                in _INDEX_ENTRY.iter_unpack(index)}
+
+    def iter_record(self, digest, chunk_size=1024 * 1024):
+        """Iterate over the raw data of a record.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the object
+        chunk_size: int, optional
+            Size of the yielded chunks
+        """
+        offset, length, _ = self.entries[digest]
+        with open(self.path, 'rb') as f:
+            yield from iter_chunks(_RecordReader(f, offset, length), chunk_size)
+
+
+class PackWriter:
+    """Class to append encrypted objects to a new pack."""
+
+    def __init__(self, path):
+        """Initialize the PackWriter class.
+
+        Parameters
+        ----------
+        path: str
+            Path to the pack, the pack is only valid once it is closed
+        """
+        self.path = path
+        self.entries = {}
+        self._file = open(path, 'wb+')
+        self._file.write(_PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION))
+
+    def write(self, chunks, flags=0):
+        """Append a record to the pack.
+
+        Parameters
+        ----------
+        chunks: iterable of bytes
+            Data of the record
+        flags: int, optional
+            Flags of the record, the id of the codec the data
+            was compressed with before encryption
+
+        Returns
+        -------
+        tuple
+            Offset, length and flags of the record data
+        """
+        record_offset = self._file.tell()
+        self._file.write(_RECORD_HEADER.pack(flags, 0))
+
+        length = 0
+        for chunk in chunks:
+            self._file.write(chunk)
+            length += len(chunk)
+
+        # Patch the length now that the whole record is written
+        self._file.seek(record_offset)
+        self._file.write(_RECORD_HEADER.pack(flags, length))
+        self._file.seek(0, os.SEEK_END)
+
+        return record_offset + _RECORD_HEADER.size, length, flags
+
+    def commit(self, digest, location):
+        """Add a written record to the index of the pack.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the object
+        location: tuple
+            Location of the record returned by `write`
+        """
+        self.entries[digest] = location
+
+    def discard(self, location):
+        """Remove the last written record from the pack.
+
+        Parameters
+        ----------
+        location: tuple
+            Location of the record returned by `write`
+        """
+        self._file.truncate(location[0] - _RECORD_HEADER.size)
+        self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        """Write the index and close the pack.
+
+        Returns
+        -------
+        bool
+            False if the pack is empty, empty packs are deleted.
+        """
+        index_offset = self._file.tell()
+        for digest in sorted(self.entries):
+            offset, length, flags = self.entries[digest]
+            self._file.write(_INDEX_ENTRY.pack(
+                bytes.fromhex(digest), offset, length, flags))
+
+        self._file.write(_PACK_FOOTER.pack(
+            index_offset, len(self.entries), PACK_MAGIC))
+        self._file.close()
+
+        if not self.entries:
+            os.remove(self.path)
+            return False
+
+        return True
+
+
+class ObjectStore:
+    """Class to store encrypted file contents addressed by their hash.
+
+    Every object is keyed by a keyed `blake2b` digest of the plain content,
+    so identical contents are encrypted and written only once, no matter
+    how many files or checkpoints reference them.
+
+    Objects are written to a pack while one is open (see `open_pack`) and
+    as loose files otherwise, both kinds are read transparently.
+
+    Attributes
+    ----------
+    path: str
+        Path to the `objects` directory
+    crypt: :class: `checkpoint.crypt.Crypt`
+        Crypt object used to encrypt/decrypt the objects
+    """
+
+    def __init__(self, checkpoint_dir, crypt):
+        """Initialize the ObjectStore class.
+
+        Parameters
+        ----------
+        checkpoint_dir: str
+            Path to the `.checkpoint` directory
+        crypt: :class: `checkpoint.crypt.Crypt`
+            Crypt object used to encrypt/decrypt the objects
+        """
+        if not isdir(checkpoint_dir):
+            raise IOError(
+                f'{checkpoint_dir} is not a valid directory'
+            )
+
+        self.path = pjoin(checkpoint_dir, OBJECTS_DIR)
+        self.packs_path = pjoin(self.path, PACKS_DIR)
+        self.crypt = crypt
+
+        os.makedirs(self.packs_path, exist_ok=True)
+        self._io = IO(path=self.path, mode='a')
+
+        self._lock = RLock()
+        self._pack_writer = None
+        self._packs = {}
+        self._load_packs()
+
+    def _iter_packs(self):
+        """Iterate over the paths of all the packs and their loaded index.
+
+        Packs that were never closed have no index, they are yielded
+        with None.
+        """
+        for name in sorted(os.listdir(self.packs_path)):
+            if not name.endswith('.pack'):
+                continue
+
+            path = pjoin(self.packs_path, name)
+            try:
+                yield path, Pack(path)
+            except ValueError:
+                yield path, None
+
+    def _load_packs(self):
+        """Load the indexes of all the packs."""
+        self._packs.clear()
+        for _, pack in self._iter_packs():
+            if pack is None:
+                continue
+
+            for digest in pack.entries:
+                self._packs[digest] = pack
+
+    def hash(self, content):
+        """Get the digest of some content.
+
+        Parameters
+        ----------
+        content: bytes
+            Content that is to be hashed
+
+        Returns
+        -------
+        str
+            Hex digest of the content
+        """
+        hasher = self._hasher()
+        hasher.update(content)
+        return hasher.hexdigest()
+
+    def hash_file(self, file_path):
+        """Get the digest of the content of a file, reading it chunk by chunk.
+
+        Parameters
+        ----------
+        file_path: str
+            Path to the file
+
+        Returns
+        -------
+        str
+            Hex digest of the content
+        """
+        hasher = self._hasher()
+        with open(file_path, 'rb') as f:
+            for chunk in iter_chunks(f):
+                hasher.update(chunk)
+
+        return hasher.hexdigest()
+
+    def _hasher(self):
+        """Get a new keyed hasher."""
+        return hashlib.blake2b(key=self.crypt.key[:64], digest_size=32)
+
+    def object_path(self, digest):
+        """Get the path of a loose object.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the object
+        """
+        return pjoin(self.path, digest[:2], digest[2:])
+
+    def contains(self, digest):
+        """Check if an object is present in the store.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the object
+        """
+        if digest in self._packs:
+            return True
+
+        if self._pack_writer and digest in self._pack_writer.entries:
+            return True
+
+        return isfile(self.object_path(digest))
+
+    def open_pack(self):
+        """Start writing new objects to a new pack."""
+        with self._lock:
+            if self._pack_writer is None:
+                self._pack_writer = PackWriter(
+                    pjoin(self.packs_path, f'{uuid4().hex}.pack'))
+
+    def close_pack(self):
+        """Finish the current pack, new objects are written as loose files again."""
+        with self._lock:
+            if self._pack_writer is None:
+                return
+
+            writer, self._pack_writer = self._pack_writer, None
+            if writer.close():
+                pack = Pack(writer.path)
+                for digest in pack.entries:
+                    self._packs[digest] = pack
+
+    def put(self, content, digest=None, codec=None):
+        """Encrypt and add some content to the store.
+
+        The content is not encrypted again if an object
+        with the same digest already exists.
+
+        Parameters
+        ----------
+        content: bytes
+            Content that is to be stored
+        digest: str, optional
+            Precomputed digest of the content
+        codec: str, optional
+            Codec used to compress the content before encryption, only
+            objects written to a pack are compressed
+
+        Returns
+        -------
+        str
+            Digest of the stored object
+        """
+        digest = digest or self.hash(content)
+        if self.contains(digest):
+            return digest
+
+        if self._pack_writer is not None:
+            # Encrypt outside of the lock, only writing to the pack is serialized
+            content, flags = compress(content, codec)
+            encrypted = list(self.crypt.encrypt_stream(content))
+            with self._lock:
+                if not self.contains(digest):
+                    self._pack_writer.commit(
+                        digest, self._pack_writer.write(encrypted, flags))
+            return digest
+
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+        # Write to a temporary file first so that a crash never
+        # leaves a truncated object behind a valid digest.
+        temp_path = f'{object_path}.tmp'
+        self._io.write(temp_path, 'wb+', self.crypt.encrypt_content(content))
+        os.replace(temp_path, object_path)
+
+        return digest
+
+    def put_stream(self, content, codec=None):
+        """Encrypt and add some content to the store chunk by chunk.
+
+        The content is hashed while it is being encrypted, so large
+        files are read only once and never held in memory as a whole.
+
+        Parameters
+        ----------
+        content: file object or iterable of bytes
+            Content that is to be stored
+        codec: str, optional
+            Codec used to compress the content before encryption, only
+            objects written to a pack are compressed
+
+        Returns
+        -------
+        str
+            Digest of the stored object
+        """
+        hasher = self._hasher()
+
+        def _hashed(chunks):
+            for chunk in chunks:
+                hasher.update(chunk)
+                yield chunk
+
+        chunks = _hashed(iter_chunks(content))
+
+        with self._lock:
+            if self._pack_writer is not None:
+                flags = get_codec_id(codec)
+                location = self._pack_writer.write(
+                    self.crypt.encrypt_stream(iter_compress(chunks, flags)), flags)
+                digest = hasher.hexdigest()
+                if self.contains(digest):
+                    self._pack_writer.discard(location)
+                else:
+                    self._pack_writer.commit(digest, location)
+                return digest
+
+        # The digest is only known once the whole content has been read
+        encrypted = self.crypt.encrypt_stream(chunks)
+        temp_fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        try:
+            with os.fdopen(temp_fd, 'wb') as f:
+                for chunk in encrypted:
+                    f.write(chunk)
+
+            digest = hasher.hexdigest()
+            if self.contains(digest):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(self.object_path(digest)), exist_ok=True)
+                os.replace(temp_path, self.object_path(digest))
+        except BaseException:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return digest
+
+    def put_file(self, file_path, codec=None):
+        """Encrypt and add the content of a file to the store chunk by chunk.
+
+        Parameters
+        ----------
+        file_path: str
+            Path to the file
+        codec: str, optional
+            Codec used to compress the content before encryption
+
+        Returns
+        -------
+        str
+            Digest of the stored object
+        """
+        with open(file_path, 'rb') as f:
+            return self.put_stream(f, codec=codec)
+
+    def put_encrypted(self, digest, encrypted, flags=0):
+        """Add content that was already encrypted to the store.
+
+        Used when the content is hashed and encrypted elsewhere, for
+        example by worker processes holding the same key.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the content
+        encrypted: list of bytes
+            Content encrypted with `Crypt.encrypt_stream`
+        flags: int, optional
+            Id of the codec the content was compressed with
+
+        Returns
+        -------
+        str
+            Digest of the stored object
+        """
+        with self._lock:
+            if self.contains(digest):
+                return digest
+
+            if self._pack_writer is not None:
+                self._pack_writer.commit(
+                    digest, self._pack_writer.write(encrypted, flags))
+                return digest
+
+        if flags:
+            raise ValueError('Compressed objects can only be stored in a pack')
+
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+        temp_path = f'{object_path}.tmp'
+        self._io.write(temp_path, 'wb+', b''.join(encrypted))
+        os.replace(temp_path, object_path)
+
+        return digest
+
+    def iter_content(self, digest):
+        """Iterate over the decrypted content of an object.
+
+        Objects stored in packs or with `put_stream` are
+        decrypted chunk by chunk.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the object
+
+        Yields
+        ------
+        bytes
+            Decrypted chunks of the object
+        """
+        if digest in self._packs:
+            pack = self._packs[digest]
+            yield from iter_decompress(
+                self.crypt.decrypt_stream(pack.iter_record(digest)),
+                pack.entries[digest][2])
+            return
+
+        if not self.contains(digest):
+            raise KeyError(f'Object {digest} does not exist')
+
+        with self._io.open(self.object_path(digest), 'rb') as f:
+            if is_stream(f.read(len(STREAM_MAGIC))):
+                f.seek(0)
+                yield from self.crypt.decrypt_stream(f)
+            else:
+                f.seek(0)
+                yield self.crypt.decrypt_content(f.read())
+
+    def get(self, digest):
+        """Get the decrypted content of an object.
+
+        Parameters
+        ----------
+        digest: str
+            Digest of the object
+
+        Returns
+        -------
+        bytes
+            Decrypted content of the object
+        """
+        return b''.join(self.iter_content(digest))
+
+    def _loose_digests(self):
+        """Iterate over the digests of all loose objects."""
+        for prefix in sorted(os.listdir(self.path)):
+            prefix_path = pjoin(self.path, prefix)
+            if len(prefix) != 2 or not isdir(prefix_path):
+                continue
+
+            for name in sorted(os.listdir(prefix_path)):
+                if not name.endswith('.tmp'):
+                    yield prefix + name
+
+    def digests(self):
+        """Iterate over the digests of all stored objects."""
+        yield from sorted(set(self._loose_digests()) | set(self._packs))
+
+    def prune(self, referenced):
+        """Delete all the objects that are not referenced.
+
+        Packs that only hold some referenced objects are rewritten
+        without the unreferenced ones. Packs that were never closed,
+        except the one being written, are deleted as their objects
+        can never be read.
+
+        Parameters
+        ----------
+        referenced: set of str
+            Digests that are still referenced by some checkpoint
+
+        Returns
+        -------
+        int
+            Number of deleted objects
+        """
+        deleted = 0
+        for digest in list(self._loose_digests()):
+            if digest not in referenced:
+                os.remove(self.object_path(digest))
+                deleted += 1
+
+        with self._lock:
+            packs = {pack.path: pack for pack in self._packs.values()}
+            for pack in packs.values():
+                unreferenced = [digest for digest in pack.entries
+                                if digest not in referenced]
+                if not unreferenced:
+                    continue
+
+                deleted += len(unreferenced)
+                if len(unreferenced) < len(pack.entries):
+                    writer = PackWriter(
+                        pjoin(self.packs_path, f'{uuid4().hex}.pack'))
+                    for digest, (_, _, flags) in pack.entries.items():
+                        if digest in referenced:
+                            writer.commit(digest, writer.write(
+                                pack.iter_record(digest), flags))
+                    writer.close()
+
+                os.remove(pack.path)
+
+            writer_path = self._pack_writer.path if self._pack_writer else None
+            for path, pack in self._iter_packs():
+                if pack is None and path != writer_path:
+                    os.remove(path)
+
+            self._load_packs()
+
+        return deleted
@@ -0,0 +1,43 @@
+import os
+
+import numpy.testing as npt
+from checkpoint import compression
+
+
+def test_compression():
+    npt.assert_equal(compression.get_codec_id(None), 0)
+    npt.assert_equal(compression.get_codec_id('zlib'), 1)
+    with npt.assert_raises(ValueError):
+        compression.get_codec_id('invalid_codec')
+
+    npt.assert_equal(compression.select_codec('src/main.py', 'zlib'), 'zlib')
+    npt.assert_equal(compression.select_codec('assets/logo.PNG', 'zlib'), None)
+    npt.assert_equal(compression.select_codec('dist/build.zip', 'lzma'), None)
+
+    content = b'Test Content ' * 1000
+    for codec in ['zlib', 'lzma']:
+        codec_id = compression.get_codec_id(codec)
+        compressed, flags = compression.compress(content, codec)
+        npt.assert_equal(flags, codec_id)
+        npt.assert_equal(len(compressed) < len(content), True)
+        npt.assert_equal(b''.join(compression.iter_decompress([compressed], flags)),
+                         content)
+
+        # Chunked compression round trips with any chunking
+        chunks = [content[idx:idx + 100] for idx in range(0, len(content), 100)]
+        compressed = b''.join(compression.iter_compress(chunks, codec_id))
+        compressed_chunks = [compressed[idx:idx + 7]
+                             for idx in range(0, len(compressed), 7)]
+        npt.assert_equal(b''.join(compression.iter_decompress(compressed_chunks,
+                                                              codec_id)), content)
+
+    # Content that does not shrink is kept as is
+    random_content = os.urandom(1024)
+    npt.assert_equal(compression.compress(random_content, 'zlib'), (random_content, 0))
+    npt.assert_equal(compression.compress(b'', 'zlib'), (b'', 0))
+    npt.assert_equal(compression.compress(content, None), (content, 0))
+    npt.assert_equal(list(compression.iter_compress([content], 0)), [content])
+
+    if compression.zstandard is None:
+        with npt.assert_raises(ImportError):
+            compression.get_codec_id('zstd')
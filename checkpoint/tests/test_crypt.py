@@ -1,9 +1,12 @@
+import os
+from io import BytesIO
 from os.path import isfile
 from os.path import join as pjoin
 from tempfile import TemporaryDirectory as InTemporaryDirectory
 
 import numpy.testing as npt
 from checkpoint import crypt
+from cryptography.exceptions import InvalidTag
 
 
 def test_generate_key():
@@ -49,3 +52,59 @@ def test_crypt():
         dec_txt = _crypt.decrypt(enc_txt)
 
         npt.assert_equal(dec_txt.decode('utf-8'), text_content)
+
+        enc_content = _crypt.encrypt_content(bytes(text_content, 'utf-8'))
+        npt.assert_equal(isinstance(enc_content, bytes), True)
+        npt.assert_equal(_crypt.decrypt_content(enc_content),
+                         bytes(text_content, 'utf-8'))
+        npt.assert_equal(_crypt.decrypt(enc_content.decode('utf-8')),
+                         bytes(text_content, 'utf-8'))
+
+
+def test_crypt_stream():
+
+    with InTemporaryDirectory() as tdir:
+        _crypt = crypt.Crypt('secret_key.key', tdir)
+
+        content = os.urandom(3 * 1024 + 7)
+        chunk_size = 1024
+        encrypted = list(_crypt.encrypt_stream(BytesIO(content),
+                                               chunk_size=chunk_size))
+
+        # Header followed by four authenticated chunks
+        npt.assert_equal(len(encrypted), 5)
+        npt.assert_equal(crypt.is_stream(encrypted[0]), True)
+        npt.assert_equal(content[:chunk_size] in b''.join(encrypted), False)
+
+        decrypted = list(_crypt.decrypt_stream(encrypted))
+        npt.assert_equal([len(chunk) for chunk in decrypted],
+                         [1024, 1024, 1024, 7])
+        npt.assert_equal(b''.join(decrypted), content)
+
+        # File objects and iterables with arbitrary chunks are accepted
+        enc_path = pjoin(tdir, 'encrypted.bin')
+        with open(enc_path, 'wb') as f:
+            for chunk in _crypt.encrypt_stream([content[:10], content[10:]]):
+                f.write(chunk)
+
+        with open(enc_path, 'rb') as f:
+            npt.assert_equal(b''.join(_crypt.decrypt_stream(f)), content)
+
+        npt.assert_equal(b''.join(_crypt.decrypt_stream(
+            _crypt.encrypt_stream(b''))), b'')
+
+        # Truncated, reordered or tampered streams are rejected
+        with npt.assert_raises(ValueError):
+            list(_crypt.decrypt_stream(encrypted[:-1]))
+
+        with npt.assert_raises(InvalidTag):
+            list(_crypt.decrypt_stream(
+                [encrypted[0], encrypted[2], encrypted[1], *encrypted[3:]]))
+
+        tampered = bytearray(b''.join(encrypted))
+        tampered[-1] ^= 1
+        with npt.assert_raises(InvalidTag):
+            list(_crypt.decrypt_stream(bytes(tampered)))
+
+        with npt.assert_raises(ValueError):
+            list(_crypt.decrypt_stream(b'not an encrypted stream'))
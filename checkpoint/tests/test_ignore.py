@@ -0,0 +1,60 @@
+import numpy.testing as npt
+from checkpoint.ignore import IgnoreRules, translate
+
+
+def test_translate():
+    npt.assert_equal(translate('*.py'), '[^/]*\\.py')
+    npt.assert_equal(translate('a/**/b'), 'a/(?:[^/]*/)*b')
+    npt.assert_equal(translate('a/**'), 'a/.*')
+
+
+def test_ignore_rules():
+    rules = IgnoreRules()
+    npt.assert_equal(bool(rules), False)
+    npt.assert_equal(rules.match('file.log'), False)
+
+    rules = IgnoreRules(['# Comment', '', '*.log', '!keep.log', 'build/',
+                         '/top.txt', 'docs/**/gen', 'out/**', '\\#hash',
+                         '[abc].o', '[!x]y.c'])
+    npt.assert_equal(bool(rules), True)
+
+    # Patterns without a separator match at any level
+    npt.assert_equal(rules.match('file.log'), True)
+    npt.assert_equal(rules.match('src/file.log'), True)
+    npt.assert_equal(rules.match('file.log.txt'), False)
+
+    # Negated patterns re-include paths, the last matching rule wins
+    npt.assert_equal(rules.match('keep.log'), False)
+    npt.assert_equal(rules.match('src/keep.log'), False)
+
+    # Directory only patterns
+    npt.assert_equal(rules.match('build', is_dir=True), True)
+    npt.assert_equal(rules.match('src/build', is_dir=True), True)
+    npt.assert_equal(rules.match('build'), False)
+
+    # Patterns with a separator are anchored
+    npt.assert_equal(rules.match('top.txt'), True)
+    npt.assert_equal(rules.match('src/top.txt'), False)
+    npt.assert_equal(rules.match('docs/gen', is_dir=True), True)
+    npt.assert_equal(rules.match('docs/api/v1/gen'), True)
+    npt.assert_equal(rules.match('src/docs/gen'), False)
+    npt.assert_equal(rules.match('out/a/b.txt'), True)
+
+    # Wildcards never match a separator
+    npt.assert_equal(IgnoreRules(['src/*.py']).match('src/a/b.py'), False)
+
+    npt.assert_equal(rules.match('#hash'), True)
+    npt.assert_equal(rules.match('b.o'), True)
+    npt.assert_equal(rules.match('d.o'), False)
+    npt.assert_equal(rules.match('zy.c'), True)
+    npt.assert_equal(rules.match('xy.c'), False)
+
+    # Rules of nested ignore files only apply inside their directory
+    rules.add_patterns(['*.tmp', '/only.txt'], base='sub')
+    npt.assert_equal(rules.match('sub/a.tmp'), True)
+    npt.assert_equal(rules.match('sub/dir/a.tmp'), True)
+    npt.assert_equal(rules.match('a.tmp'), False)
+    npt.assert_equal(rules.match('sub/only.txt'), True)
+    npt.assert_equal(rules.match('sub/dir/only.txt'), False)
+
+    npt.assert_equal(rules.add_file('missing.gitignore'), False)
@@ -99,3 +99,67 @@ def test_io():
 
         with npt.assert_raises(IOError):
             non_lazy_io.delete_dir(new_dir)
+
+
+def test_ignore_dirs():
+
+    with InTemporaryDirectory() as tdir:
+        for sub_dir in ['node_modules/pkg', 'src/build', 'my.gitignore_stuff',
+                        'src/cache.tmp', 'docs/build']:
+            os.makedirs(pjoin(tdir, *sub_dir.split('/')))
+
+        for file in ['root.txt', 'node_modules/pkg/index.js', 'src/main.py',
+                     'src/build/out.o', 'my.gitignore_stuff/notes.txt',
+                     'src/cache.tmp/data', 'docs/build/index.html']:
+            with open(pjoin(tdir, *file.split('/')), 'w') as f:
+                f.write(file)
+
+        ignore_io = io.IO(path=tdir, mode='a',
+                          ignore_dirs=['node_modules', '.git', '*.tmp',
+                                       'src/build'])
+
+        files = sorted(os.path.relpath(pjoin(root, file), tdir).replace(os.sep, '/')
+                       for root, file in ignore_io.walk_directory())
+
+        # Ignored directories match whole names, not substrings
+        npt.assert_equal(files, ['docs/build/index.html',
+                                 'my.gitignore_stuff/notes.txt',
+                                 'root.txt', 'src/main.py'])
+
+        ignore_io.update_paths(tdir)
+        npt.assert_equal(sorted(ignore_io.sub_dirs),
+                         sorted(pjoin(tdir, *sub_dir.split('/')) for sub_dir in
+                                ['docs', 'docs/build', 'my.gitignore_stuff', 'src']))
+        npt.assert_equal(len(ignore_io.files), 4)
+
+        # Rules of the ignore files are applied during the walk
+        with open(pjoin(tdir, '.gitignore'), 'w') as f:
+            f.write('*.txt\n!root.txt\ndocs/\n')
+
+        with open(pjoin(tdir, 'src', '.checkpointignore'), 'w') as f:
+            f.write('main.py\n')
+
+        rules_io = io.IO(path=tdir, mode='a', ignore_dirs=['node_modules'],
+                         ignore_files=['.gitignore', '.checkpointignore'])
+
+        files = sorted(os.path.relpath(pjoin(root, file), tdir).replace(os.sep, '/')
+                       for root, file in rules_io.walk_directory())
+        npt.assert_equal(files, ['.gitignore', 'root.txt',
+                                 'src/.checkpointignore',
+                                 'src/build/out.o', 'src/cache.tmp/data'])
+
+        # Rules only apply below their ignore file, deeper rules win
+        for rel_path in ['lib/main.py', 'src/keep/main.py']:
+            os.makedirs(pjoin(tdir, os.path.dirname(rel_path)), exist_ok=True)
+            with open(pjoin(tdir, rel_path), 'w') as f:
+                f.write('content')
+
+        with open(pjoin(tdir, 'src', 'keep', '.gitignore'), 'w') as f:
+            f.write('!main.py\n')
+
+        files = sorted(os.path.relpath(pjoin(root, file), tdir).replace(os.sep, '/')
+                       for root, file in rules_io.walk_directory())
+        npt.assert_equal(files, ['.gitignore', 'lib/main.py', 'root.txt',
+                                 'src/.checkpointignore',
+                                 'src/build/out.o', 'src/cache.tmp/data',
+                                 'src/keep/.gitignore', 'src/keep/main.py'])
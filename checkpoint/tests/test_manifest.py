@@ -0,0 +1,49 @@
+import os
+from os.path import join as pjoin
+from tempfile import TemporaryDirectory as InTemporaryDirectory
+
+import numpy.testing as npt
+from checkpoint.manifest import Manifest, ManifestEntry, write_manifest
+
+
+def test_manifest():
+    with InTemporaryDirectory() as tdir:
+        manifest_path = pjoin(tdir, 'test.manifest')
+        paths = ['src/main.py', 'README.md', 'src/utils/io.py', 'src.py',
+                 'docs/index.rst', 'src/utils/__init__.py', 'dätä.txt']
+        entries = [ManifestEntry(path, idx, idx * 10, 0o100644, idx * 100,
+                                 f'{idx:02x}' * 32)
+                   for idx, path in enumerate(paths)]
+
+        write_manifest(manifest_path, entries, timestamp=42)
+        npt.assert_equal(os.listdir(tdir), ['test.manifest'])
+
+        with Manifest(manifest_path) as manifest:
+            npt.assert_equal(len(manifest), len(paths))
+            npt.assert_equal(manifest.timestamp, 42)
+
+            # Entries are sorted by path
+            npt.assert_equal([entry.path for entry in manifest],
+                             sorted(paths, key=lambda path: path.encode('utf-8')))
+            npt.assert_equal(manifest.get('src/utils/io.py'), entries[2])
+            npt.assert_equal(manifest.get('dätä.txt'), entries[6])
+            npt.assert_equal(manifest.get('src'), None)
+            npt.assert_equal('README.md' in manifest, True)
+            npt.assert_equal('missing.md' in manifest, False)
+
+            # Directories are listed with a prefix lookup
+            npt.assert_equal([entry.path for entry in manifest.iter_prefix('src/')],
+                             ['src/main.py', 'src/utils/__init__.py', 'src/utils/io.py'])
+            npt.assert_equal(list(manifest.iter_prefix('missing/')), [])
+
+        write_manifest(manifest_path, [])
+        with Manifest(manifest_path) as manifest:
+            npt.assert_equal(len(manifest), 0)
+            npt.assert_equal(manifest.get('README.md'), None)
+
+        invalid_path = pjoin(tdir, 'invalid.manifest')
+        with open(invalid_path, 'wb') as f:
+            f.write(b'invalid manifest content')
+
+        with npt.assert_raises(ValueError):
+            _ = Manifest(invalid_path)
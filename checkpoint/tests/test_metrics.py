@@ -0,0 +1,71 @@
+import json
+from os.path import join as pjoin
+from tempfile import TemporaryDirectory as InTemporaryDirectory
+
+import numpy.testing as npt
+from checkpoint.metrics import SequenceMetrics, trace_path
+from checkpoint.sequences import Sequence
+
+
+def test_sequence_metrics():
+    metrics = SequenceMetrics()
+    sequence = Sequence('outer_sequence')
+    inner_sequence = Sequence('inner_sequence', metrics=metrics)
+
+    def seq_inner():
+        inner_sequence.count(files=2, nbytes=10)
+        inner_sequence.count(files=1, nbytes=5)
+
+    def seq_outer():
+        inner_sequence.add_sequence_function(seq_inner)
+        return inner_sequence.execute_sequence(execution_policy='increasing_order')
+
+    def seq_fail():
+        raise RuntimeError('failed')
+
+    ended = []
+    sequence.on_sequence_function_end = lambda seq: ended.append(seq.current_function)
+    metrics.attach(sequence)
+
+    sequence.add_sequence_function(seq_outer, order=0)
+    sequence.add_sequence_function(seq_fail, order=1)
+    with npt.assert_raises(RuntimeError):
+        sequence.execute_sequence(execution_policy='increasing_order')
+
+    # Hooks set before attaching are still called, failures are recorded
+    npt.assert_equal(ended, ['seq_outer', 'seq_fail'])
+    stages = {(stage['sequence'], stage['stage']): stage for stage in metrics.stages}
+    npt.assert_equal(sorted(stages), [('inner_sequence', 'seq_inner'),
+                                      ('outer_sequence', 'seq_fail'),
+                                      ('outer_sequence', 'seq_outer')])
+
+    inner = stages['inner_sequence', 'seq_inner']
+    outer = stages['outer_sequence', 'seq_outer']
+    npt.assert_equal([inner['files'], inner['bytes']], [3, 15])
+    npt.assert_equal([inner['depth'], outer['depth']], [1, 0])
+    npt.assert_equal(inner['status'], 'SUCCESS')
+    npt.assert_equal(stages['outer_sequence', 'seq_fail']['status'], 'FAILED')
+    npt.assert_equal(outer['start'] <= inner['start'], True)
+    npt.assert_equal(outer['wall_time'] >= inner['wall_time'], True)
+    npt.assert_equal(outer['cpu_time'] >= 0, True)
+
+    with InTemporaryDirectory() as tdir:
+        report_path = pjoin(tdir, 'report.json')
+        npt.assert_equal(trace_path(report_path), pjoin(tdir, 'report.trace.json'))
+
+        metrics.write_report(report_path)
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+        npt.assert_equal([stage['stage'] for stage in report['stages']],
+                         ['seq_outer', 'seq_inner', 'seq_fail'])
+        npt.assert_equal(report['wall_time'] >= outer['wall_time'], True)
+
+        metrics.write_trace(trace_path(report_path))
+        with open(trace_path(report_path), 'r') as f:
+            events = json.load(f)['traceEvents']
+        npt.assert_equal([event['ph'] for event in events], ['X'] * 3)
+        npt.assert_equal(events[1]['cat'], 'inner_sequence')
+        npt.assert_equal(events[1]['args']['files'], 3)
+        npt.assert_equal(events[0]['ts'] <= events[1]['ts'], True)
+        npt.assert_equal(events[0]['ts'] + events[0]['dur'] >=
+                         events[1]['ts'] + events[1]['dur'], True)
@@ -0,0 +1,64 @@
+import os
+import pstats
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from math import factorial
+from os.path import join as pjoin
+from tempfile import TemporaryDirectory as InTemporaryDirectory
+
+import numpy.testing as npt
+from checkpoint.profiling import ProfiledCall, StageProfiler
+from checkpoint.sequences import Sequence
+
+
+def test_stage_profiler():
+    with InTemporaryDirectory() as tdir:
+        profiler = StageProfiler(tdir, prefix='run')
+        sequence = Sequence('outer_sequence', profiler=profiler)
+        inner_sequence = Sequence('inner_sequence', profiler=profiler)
+
+        npt.assert_equal(profiler.wrap(factorial) is factorial, True)
+
+        def _thread_work(value):
+            return sorted(range(value))[-1]
+
+        def seq_inner():
+            with ThreadPoolExecutor(2) as executor:
+                return list(executor.map(sequence._profiled(_thread_work), [10, 20]))
+
+        def seq_outer():
+            inner_sequence.add_sequence_function(seq_inner)
+            with ProcessPoolExecutor(1) as executor:
+                values = list(executor.map(sequence._profiled(factorial), [5]))
+            return values + inner_sequence.execute_sequence(
+                execution_policy='increasing_order')
+
+        sequence.add_sequence_function(seq_outer)
+        npt.assert_equal(sequence.execute_sequence(execution_policy='increasing_order'),
+                         [[120, [9, 19]]])
+
+        outer_path = pjoin(tdir, 'run.outer_sequence.seq_outer.pstats')
+        inner_path = pjoin(tdir, 'run.inner_sequence.seq_inner.pstats')
+        npt.assert_equal(profiler.paths, [inner_path, outer_path])
+        npt.assert_equal(profiler.stats_path('outer_sequence', 'seq_outer'), outer_path)
+        npt.assert_equal(sorted(os.listdir(tdir)),
+                         ['run.inner_sequence.seq_inner.pstats',
+                          'run.outer_sequence.seq_outer.pstats'])
+
+        # Worker calls are merged into the stage that started them and
+        # nested stages are not counted in their parent
+        outer = {func[2]: stat for func, stat in pstats.Stats(outer_path).stats.items()}
+        inner = {func[2]: stat for func, stat in pstats.Stats(inner_path).stats.items()}
+        npt.assert_equal('<built-in method math.factorial>' in outer, True)
+        npt.assert_equal('_thread_work' in outer, False)
+        npt.assert_equal(inner['_thread_work'][1], 2)
+
+        # Stages that run again are merged into the same stats
+        inner_sequence.execute_sequence(execution_policy='increasing_order')
+        inner = {func[2]: stat for func, stat in pstats.Stats(inner_path).stats.items()}
+        npt.assert_equal(inner['_thread_work'][1], 4)
+
+        # Calls are dumped into the worker directory
+        profiled = ProfiledCall(factorial, tdir)
+        npt.assert_equal(profiled(4), 24)
+        npt.assert_equal(len([file for file in os.listdir(tdir)
+                              if file.startswith(f'{os.getpid()}-')]), 1)
@@ -37,6 +37,26 @@ def test_reader():
         extensions = ['txt', 'log']
         npt.assert_equal(core_reader.validate_extensions(extensions), [])
 
+    # Extensions are probed once per reader, reads never probe again
+    class ProbedReader(SimpleReader):
+        probed = []
+
+        def _validate_extensions(self, extensions):
+            self.probed.extend(extensions)
+            return [idx for idx, ext in enumerate(extensions) if ext == 'log']
+
+    probed_reader = ProbedReader(valid_extensions=['txt', 'log'])
+    with InTemporaryDirectory() as tdir:
+        files = [pjoin(tdir, f'file{idx}.txt') for idx in range(5)]
+        files.append(pjoin(tdir, 'file.log'))
+
+        npt.assert_equal(probed_reader.read(files), ['test'] * 5)
+        npt.assert_equal(probed_reader.read(files), ['test'] * 5)
+        npt.assert_equal(len(files), 6)
+        npt.assert_equal(ProbedReader.probed, ['txt', 'log'])
+        npt.assert_equal(probed_reader.supports('txt'), True)
+        npt.assert_equal(probed_reader.supports('log'), False)
+
 
 def test_text_reader():
     simple_text_reader = readers.TextReader()
@@ -53,11 +73,26 @@ def test_text_reader():
         io.write(valid_file, 'w+', 'Test Content')
 
         npt.assert_equal(simple_text_reader.read(valid_file),
-                         [{valid_file: 'Test Content'}])
+                         [{valid_file: b'Test Content'}])
+
+        # Text files are read byte for byte, decoding is left to the caller
+        crlf_file = pjoin(tdir, 'crlf.txt')
+        io.write(crlf_file, 'wb+', b'Test\r\nContent \xe9')
+        npt.assert_equal(simple_text_reader.read(crlf_file),
+                         [{crlf_file: b'Test\r\nContent \xe9'}])
+        npt.assert_equal(simple_text_reader.read(crlf_file, raw=True),
+                         [{crlf_file: b'Test\r\nContent \xe9'}])
+
+        content = simple_text_reader.read(crlf_file)[0][crlf_file]
+        npt.assert_equal(simple_text_reader.decode(content, encoding='latin-1'),
+                         'Test\r\nContent \xe9')
+        npt.assert_equal(simple_text_reader.decode(b'a\r\nb\rc\n', normalize_newlines=True),
+                         'a\nb\nc\n')
+        with npt.assert_raises(UnicodeDecodeError):
+            simple_text_reader.decode(content)
 
         valid_extensions = ['txt', 'log']
-        simple_text_reader.validate_extensions(valid_extensions)
-
+        npt.assert_equal(simple_text_reader.validate_extensions(valid_extensions), [])
         npt.assert_equal(valid_extensions, ['txt', 'log'])
 
 
@@ -80,13 +115,64 @@ def test_image_reader():
         npt.assert_equal(image_reader.read(valid_file)[0],
                          {valid_file: img_data.tobytes()})
 
+        with open(valid_file, 'rb') as f:
+            npt.assert_equal(image_reader.read(valid_file, raw=True)[0],
+                             {valid_file: f.read()})
+
         extensions = ['png', 'jpg', 'invalid']
         image_reader.validate_extensions(extensions)
 
         npt.assert_equal(extensions, ['png', 'jpg'])
 
+        # Metadata is read from the image headers
+        npt.assert_equal(image_reader.read_metadata(valid_file),
+                         {'format': 'PNG', 'width': 300, 'height': 300, 'mode': 'RGB'})
+        npt.assert_equal(image_reader.read_metadata(invalid_file), None)
+
 
 def test_get_all_readers():
     all_readers = readers.get_all_readers()
     npt.assert_array_equal(set(all_readers), set(
         [readers.TextReader, readers.ImageReader, readers.ByteReader]))
+
+
+def test_get_reader_registry():
+    registry = readers.get_reader_registry()
+    npt.assert_equal(registry is readers.get_reader_registry(), True)
+    npt.assert_equal(registry['txt'].__class__.__name__, 'TextReader')
+    npt.assert_equal(registry['png'].__class__.__name__, 'ImageReader')
+    npt.assert_equal(registry['zip'].__class__.__name__, 'ByteReader')
+    npt.assert_equal('invalid' in registry, False)
+
+    # Extensions of the same reader share a single instance
+    npt.assert_equal(registry['txt'] is registry['py'], True)
+
+
+def test_sniff_reader():
+    npt.assert_equal(readers.is_text(b''), True)
+    npt.assert_equal(readers.is_text('key: välue'.encode('utf-8')), True)
+    # Multi-byte characters cut at the end of the prefix are tolerated
+    npt.assert_equal(readers.is_text('välue'.encode('utf-8')[:2]), True)
+    npt.assert_equal(readers.is_text(b'\x00\x01\x02'), False)
+    npt.assert_equal(readers.is_text(b'\xff\xfe\xfd'), False)
+
+    with InTemporaryDirectory() as tdir:
+        text_file = pjoin(tdir, 'config.yaml')
+        byte_file = pjoin(tdir, 'data.sniffed')
+        with open(text_file, 'w') as f:
+            f.write('key: value')
+        with open(byte_file, 'wb') as f:
+            f.write(b'\x00\x01binary')
+
+        reader = readers.sniff_reader('yaml', [pjoin(tdir, 'missing.yaml'), text_file])
+        npt.assert_equal(reader.__class__.__name__, 'TextReader')
+
+        reader = readers.sniff_reader('sniffed', [byte_file])
+        npt.assert_equal(reader.__class__.__name__, 'ByteReader')
+        npt.assert_equal(reader.read([byte_file], validate=False, raw=True),
+                         [{byte_file: b'\x00\x01binary'}])
+
+        # The verdict is cached per extension
+        npt.assert_equal(readers.sniff_reader('yaml', []).__class__.__name__,
+                         'TextReader')
+        npt.assert_equal(readers.sniff_reader('unknown', []), None)
@@ -1,15 +1,22 @@
+import json
+import os
 from argparse import ArgumentParser
 from os.path import isdir, isfile
 from os.path import join as pjoin
 from shutil import rmtree
 from tempfile import TemporaryDirectory as InTemporaryDirectory
+from time import time_ns
 
 import numpy.testing as npt
 from checkpoint import __version__ as version
 from checkpoint.crypt import Crypt
 from checkpoint.io import IO
+from checkpoint.manifest import Manifest
+from checkpoint.metrics import SequenceMetrics
 from checkpoint.sequences import (CheckpointSequence, CLISequence, IOSequence,
-                                  Sequence)
+                                  Sequence, StreamingIOSequence)
+from checkpoint.store import ObjectStore
+from checkpoint.utils import get_reader_by_extension
 
 
 def test_sequence():
@@ -139,6 +146,124 @@ def test_io_sequence():
         #     return_vals[4][pjoin(io.path, 'text_files', 'test.txt')])
         # npt.assert_equal(dec_content.decode('utf-8'), 'test')
 
+        # Testing incremental sequence, only the changed files are re-read
+        parent_manifest = {'store': 'objects', 'timestamp': time_ns(),
+                           'files': return_vals[-1], 'index': io_sequence.index}
+        io.write(pjoin(text_path, 'test1.txt'), 'w+', 'test1 changed')
+
+        incremental_sequence = IOSequence(sequence_name='test_incremental_sequence',
+                                          root_dir=io.path, ignore_dirs=['binary_files'],
+                                          parent_manifest=parent_manifest)
+        enc_files = incremental_sequence.execute_sequence(pass_args=True)[-1]
+
+        npt.assert_equal(list(incremental_sequence.unchanged),
+                         [pjoin(text_path, 'test.txt')])
+        npt.assert_equal(enc_files[pjoin(text_path, 'test.txt')],
+                         parent_manifest['files'][pjoin(text_path, 'test.txt')])
+        npt.assert_equal(enc_files[pjoin(text_path, 'test1.txt')] !=
+                         parent_manifest['files'][pjoin(text_path, 'test1.txt')], True)
+
+        # Files without a default reader are mapped by their content
+        io.write(pjoin(text_path, 'config.yaml'), 'w+', 'key: value')
+        io.write(pjoin(text_path, 'LICENSE'), 'w+', 'License')
+        io.write(pjoin(text_path, 'data.dat'), 'wb+', b'\x00\x01')
+
+        sniff_sequence = IOSequence(sequence_name='test_sniff_sequence',
+                                    root_dir=io.path, ignore_dirs=['binary_files'])
+        enc_files = sniff_sequence.execute_sequence(pass_args=True)[-1]
+        crypt_obj = Crypt('crypt.key', pjoin(io.path, '.checkpoint'))
+        store = ObjectStore(pjoin(io.path, '.checkpoint'), crypt_obj)
+
+        npt.assert_equal(store.get(enc_files[pjoin(text_path, 'config.yaml')]),
+                         b'key: value')
+        npt.assert_equal(store.get(enc_files[pjoin(text_path, 'LICENSE')]),
+                         b'License')
+        npt.assert_equal(store.get(enc_files[pjoin(text_path, 'data.dat')]),
+                         b'\x00\x01')
+
+        # Rules of .gitignore files can be turned off
+        io.write(pjoin(text_path, '.gitignore'), 'w+', 'LICENSE')
+        gitignore_files = IOSequence(root_dir=io.path, ignore_dirs=['binary_files'])
+        npt.assert_equal(pjoin(text_path, 'LICENSE') in
+                         gitignore_files.execute_sequence(pass_args=True)[-1], False)
+        no_gitignore_files = IOSequence(root_dir=io.path, ignore_dirs=['binary_files'],
+                                        gitignore=False)
+        npt.assert_equal(pjoin(text_path, 'LICENSE') in
+                         no_gitignore_files.execute_sequence(pass_args=True)[-1], True)
+        os.remove(pjoin(text_path, '.gitignore'))
+
+        # Files are encrypted in parallel with the same resulting mapping
+        for pool in ['threads', 'processes']:
+            pool_sequence = IOSequence(sequence_name='test_pool_sequence',
+                                       root_dir=io.path, ignore_dirs=['binary_files'],
+                                       num_cores=2, pool=pool)
+            pool_files = pool_sequence.execute_sequence(pass_args=True)[-1]
+            npt.assert_equal(pool_files, enc_files)
+            npt.assert_equal(list(pool_files), list(enc_files))
+
+        with npt.assert_raises(ValueError):
+            _ = IOSequence(root_dir=io.path, pool='invalid_pool')
+
+        # Files are compressed before encryption by the workers
+        for pool in ['threads', 'processes']:
+            compressible_file = pjoin(text_path, f'compressible_{pool}.txt')
+            io.write(compressible_file, 'w+', f'{pool} ' * 1000)
+            compression_sequence = IOSequence(sequence_name='test_compression_sequence',
+                                              root_dir=io.path, ignore_dirs=['binary_files'],
+                                              num_cores=2, pool=pool, compression='zlib')
+            compressed_files = compression_sequence.execute_sequence(pass_args=True)[-1]
+
+            store = ObjectStore(pjoin(io.path, '.checkpoint'), crypt_obj)
+            digest = compressed_files[compressible_file]
+            npt.assert_equal(store.get(digest), f'{pool} '.encode('utf-8') * 1000)
+            npt.assert_equal(store._packs[digest].entries[digest][2], 1)
+
+        with npt.assert_raises(ValueError):
+            _ = IOSequence(root_dir=io.path, compression='invalid_codec')
+
+        # A single large extension group is spread over all the workers
+        batch_sequence = IOSequence(sequence_name='test_batch_sequence',
+                                    root_dir=io.path, num_cores=2)
+        text_reader = get_reader_by_extension('txt')
+        files = [pjoin(text_path, f'test{idx}.txt') for idx in range(16)]
+        for file in files:
+            io.write(file, 'w+', 'test')
+        batches = batch_sequence._read_batches({'txt': text_reader, 'md': text_reader},
+                                               {'txt': files, 'md': [files[0]]})
+
+        npt.assert_equal(len(batches) >= 2 * batch_sequence.num_cores, True)
+        npt.assert_equal(max(len(batch) for _, batch in batches) < len(files), True)
+        npt.assert_equal(sum((batch for _, batch in batches), []), files + [files[0]])
+
+
+def test_streaming_io_sequence():
+    with InTemporaryDirectory() as tdir:
+        io = IO(path=tdir, mode='a')
+        _checkpoint_sequernce = CheckpointSequence(sequence_name='checkpoint_sequence',
+                                                   order_dict={
+                                                       'seq_init_checkpoint': 0},
+                                                   root_dir=tdir, ignore_dirs=list())
+
+        _checkpoint_sequernce.seq_init_checkpoint()
+        io.make_dir('text_files')
+        file2content = {}
+        for idx in range(20):
+            file_path = pjoin(io.path, 'text_files', f'test{idx}.txt')
+            file2content[file_path] = f'test content {idx}'
+            io.write(file_path, 'w+', file2content[file_path])
+
+        io_sequence = StreamingIOSequence(root_dir=io.path, num_cores=4,
+                                          max_inflight_bytes=32)
+        enc_files = io_sequence.execute_sequence(pass_args=True)[-1]
+
+        crypt_obj = Crypt('crypt.key', pjoin(io.path, '.checkpoint'))
+        store = ObjectStore(pjoin(io.path, '.checkpoint'), crypt_obj)
+
+        npt.assert_equal(set(enc_files), set(file2content))
+        for file_path, digest in enc_files.items():
+            npt.assert_equal(store.get(digest).decode('utf-8'),
+                             file2content[file_path])
+
 
 def test_checkpoint_sequence():
     order_dict = {
@@ -172,7 +297,19 @@ def test_checkpoint_sequence():
 
         checkpoint_files = [file for _, file in io.walk_directory()]
         npt.assert_equal(sorted(checkpoint_files), sorted([
-                         '.metadata', f'{checkpoint_sequence.sequence_name}.json']))
+                         '.metadata', f'{checkpoint_sequence.sequence_name}.json',
+                         f'{checkpoint_sequence.sequence_name}.manifest']))
+
+        with Manifest(pjoin(io.path, f'{checkpoint_sequence.sequence_name}.manifest')) as manifest:
+            npt.assert_equal([entry.path for entry in manifest], ['test.txt', 'test1.txt'])
+            npt.assert_equal(manifest.get('test1.txt').size, 5)
+
+        # Metadata lists the files of the walk the checkpoint was created from
+        with open(pjoin(io.path, '.metadata'), 'r') as f:
+            metadata = json.load(f)
+        npt.assert_equal(list(metadata), [tdir])
+        npt.assert_equal(sorted(metadata[tdir]), [pjoin(tdir, 'test.txt'),
+                                                  pjoin(tdir, 'test1.txt')])
 
         checkpoint_sequence_two = CheckpointSequence(sequence_name='checkpoint_sequence_two',
                                                      order_dict=order_dict,
@@ -182,6 +319,23 @@ def test_checkpoint_sequence():
         io.write(pjoin(tdir, 'test1.txt'), 'a', 'added text')
         checkpoint_sequence_two.seq_create_checkpoint()
 
+        # Testing checkpoint restoration with a pool of processes
+        io.write(pjoin(tdir, 'test.txt'), 'w+', 'changed')
+        checkpoint_sequence_processes = CheckpointSequence(sequence_name='checkpoint_sequence_two',
+                                                           order_dict=order_dict,
+                                                           root_dir=tdir, ignore_dirs=list(),
+                                                           num_cores=2, pool='processes')
+        checkpoint_sequence_processes.seq_restore_checkpoint()
+        contents = [io.read(pjoin(root, file), 'r') for root,
+                    file in io.walk_directory() if '.checkpoint' not in root]
+
+        npt.assert_equal(set(contents), set(['testadded text', 'test1added text']))
+
+        with npt.assert_raises(ValueError):
+            _ = CheckpointSequence(sequence_name='checkpoint_sequence_two',
+                                   order_dict=order_dict, root_dir=tdir,
+                                   ignore_dirs=list(), pool='invalid')
+
         # Testing checkpoint restoration phase of sequence
         checkpoint_sequence.seq_restore_checkpoint()
         contents = [io.read(pjoin(root, file), 'r') for root,
@@ -189,10 +343,52 @@ def test_checkpoint_sequence():
 
         npt.assert_equal(set(contents), set(['test', 'test1']))
 
+        # Testing differential restoration, only changed files are rewritten
+        differential_sequence = CheckpointSequence(sequence_name='checkpoint_sequence',
+                                                   order_dict=order_dict,
+                                                   root_dir=tdir, ignore_dirs=list(),
+                                                   differential=True)
+        mtime = os.stat(pjoin(tdir, 'test.txt')).st_mtime_ns
+        report = differential_sequence.seq_restore_checkpoint()
+        npt.assert_equal(report['restored'], [])
+        npt.assert_equal(sorted(report['skipped']), sorted([pjoin(tdir, 'test.txt'),
+                                                            pjoin(tdir, 'test1.txt')]))
+        npt.assert_equal(os.stat(pjoin(tdir, 'test.txt')).st_mtime_ns, mtime)
+
+        io.write(pjoin(tdir, 'test1.txt'), 'w+', 'test2')
+        report = differential_sequence.seq_restore_checkpoint()
+        npt.assert_equal(report['restored'], [pjoin(tdir, 'test1.txt')])
+        npt.assert_equal(report['skipped'], [pjoin(tdir, 'test.txt')])
+        npt.assert_equal(io.read(pjoin(tdir, 'test1.txt')), 'test1')
+
+        # Testing partial restoration, only the matching files are restored
+        io.write(pjoin(tdir, 'test.txt'), 'w+', 'test changed')
+        io.write(pjoin(tdir, 'test1.txt'), 'w+', 'test1 changed')
+        for only in [['test1.*'], ['*1.txt', 'missing/']]:
+            partial_sequence = CheckpointSequence(sequence_name='checkpoint_sequence',
+                                                  order_dict=order_dict,
+                                                  root_dir=tdir, ignore_dirs=list(),
+                                                  only=only)
+            report = partial_sequence.seq_restore_checkpoint()
+            npt.assert_equal(report['restored'], [pjoin(tdir, 'test1.txt')])
+            npt.assert_equal(io.read(pjoin(tdir, 'test.txt')), 'test changed')
+            npt.assert_equal(io.read(pjoin(tdir, 'test1.txt')), 'test1')
+        io.write(pjoin(tdir, 'test.txt'), 'w+', 'test')
+
+        checkpoint_dir = pjoin(tdir, '.checkpoint')
+        store = ObjectStore(checkpoint_dir, Crypt('crypt.key', checkpoint_dir))
+        npt.assert_equal(len(list(store.digests())), 4)
+
         checkpoint_sequence.seq_delete_checkpoint()
         npt.assert_equal(isdir(checkpoint_path), False)
 
+        # Only the objects referenced by the remaining checkpoint are kept
+        store = ObjectStore(checkpoint_dir, Crypt('crypt.key', checkpoint_dir))
+        npt.assert_equal(len(list(store.digests())), 2)
+
         checkpoint_sequence.seq_version()
+        # Messages are buffered until the end of a sequence function
+        checkpoint_sequence.logger.flush()
         with open('logs.log', 'r') as f:
             logs = f.read()
             npt.assert_equal(version in logs, True)
@@ -214,8 +410,11 @@ def test_CLI_sequence():
 
         all_args = {'init': ['-p', tdir, '-a', 'init'],
                     'create': ['-n', 'restore_point', '-p', tdir, '-a', 'create'],
+                    'stream_create': ['-n', 'stream_restore_point', '-p', tdir,
+                                      '-a', 'create', '--stream'],
                     'restore': ['-n', 'restore_point', '-p', tdir, '-a', 'restore'],
                     'delete': ['-n', 'restore_point', '-p', tdir, '-a', 'delete'],
+                    'missing_restore': ['-n', 'missing_point', '-p', tdir, '-a', 'restore'],
                     'invalid_action': ['-n', 'restore_point', '-p', tdir, '-a', 'invalid_action']}
 
         arg_parser = ArgumentParser(
@@ -254,6 +453,13 @@ def test_CLI_sequence():
             help="Ignore directories."
         )
 
+        arg_parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Stream files into the checkpoint.",
+            default=False,
+        )
+
         for action, args in all_args.items():
             print(action, args)
             if action == 'init':
@@ -268,13 +474,38 @@ def test_CLI_sequence():
                 io.write(pjoin(tdir, 'test.txt'), 'w+', 'test')
                 io.write(pjoin(tdir, 'test1.txt'), 'w+', 'test1')
 
-                cli_sequence = CLISequence(arg_parser=arg_parser, args=args)
+                metrics = SequenceMetrics()
+                cli_sequence = CLISequence(arg_parser=arg_parser, args=args,
+                                           metrics=metrics)
                 cli_sequence.execute_sequence(pass_args=True)
 
                 checkpoint_path = pjoin(tdir, '.checkpoint',
                                         args[1])
 
                 npt.assert_equal(isdir(checkpoint_path), True)
+
+                # Stages of the nested sequences are recorded too
+                stages = {stage['stage']: stage for stage in metrics.stages}
+                npt.assert_equal(stages['seq_perform_action']['depth'], 0)
+                npt.assert_equal(stages['seq_create_checkpoint']['depth'], 1)
+                npt.assert_equal(stages['seq_read_files']['depth'], 2)
+                npt.assert_equal(stages['seq_read_files']['sequence'], 'IO_Sequence')
+                npt.assert_equal([stages['seq_encrypt_files']['files'],
+                                  stages['seq_encrypt_files']['bytes']], [2, 9])
+            elif action == 'stream_create':
+                metrics = SequenceMetrics()
+                cli_sequence = CLISequence(arg_parser=arg_parser, args=args,
+                                           metrics=metrics)
+                cli_sequence.execute_sequence(pass_args=True)
+
+                checkpoint_path = pjoin(tdir, '.checkpoint', args[1])
+                npt.assert_equal(isdir(checkpoint_path), True)
+
+                # Files are read by the streaming sequence
+                stages = {stage['stage']: stage for stage in metrics.stages}
+                npt.assert_equal(stages['seq_read_files']['sequence'], 'Streaming_IO_Sequence')
+                npt.assert_equal([stages['seq_encrypt_files']['files'],
+                                  stages['seq_encrypt_files']['bytes']], [2, 9])
             elif action == 'restore':
                 io.write(pjoin(tdir, 'test.txt'), 'w+', 'test changed')
                 io.write(pjoin(tdir, 'test1.txt'), 'w+', 'test1 changed')
@@ -292,6 +523,17 @@ def test_CLI_sequence():
 
                 checkpoint_path = pjoin(tdir, '.checkpoint', args[1])
                 npt.assert_equal(isdir(checkpoint_path), False)
+            elif action == 'missing_restore':
+                # Errors logged after a failed action are in the logs right away
+                cli_sequence = CLISequence(arg_parser=arg_parser, args=args)
+                try:
+                    cli_sequence.execute_sequence(pass_args=True)
+                except ValueError as e:
+                    cli_sequence.logger.log(e, log_type="ERROR")
+
+                logs = io.read('logs.log', 'r')
+                npt.assert_equal('Perform Action - ERROR' in logs, True)
+                npt.assert_equal('Checkpoint missing_point does not exist' in logs, True)
             elif action == 'invalid_action':
                 cli_sequence = CLISequence(arg_parser=arg_parser, args=args)
                 with npt.assert_raises(ValueError):
@@ -0,0 +1,176 @@
+import os
+from io import BytesIO
+from os.path import isdir, isfile
+from os.path import join as pjoin
+from tempfile import TemporaryDirectory as InTemporaryDirectory
+
+import numpy.testing as npt
+from checkpoint.crypt import Crypt, is_stream
+from checkpoint.store import ObjectStore, Pack, PackWriter
+
+
+def test_object_store():
+    with InTemporaryDirectory() as tdir:
+        with npt.assert_raises(IOError):
+            _ = ObjectStore(pjoin(tdir, 'invalid_dir'), None)
+
+        crypt = Crypt('crypt.key', tdir)
+        store = ObjectStore(tdir, crypt)
+        npt.assert_equal(isdir(pjoin(tdir, 'objects')), True)
+
+        content = b'Test Content'
+        digest = store.hash(content)
+        npt.assert_equal(store.contains(digest), False)
+
+        npt.assert_equal(store.put(content), digest)
+        npt.assert_equal(store.contains(digest), True)
+        npt.assert_equal(store.get(digest), content)
+
+        # Identical content should map to the same object
+        mtime = os.stat(store.object_path(digest)).st_mtime_ns
+        npt.assert_equal(store.put(b'Test Content'), digest)
+        npt.assert_equal(os.stat(store.object_path(digest)).st_mtime_ns, mtime)
+
+        # Objects are stored encrypted
+        with open(store.object_path(digest), 'rb') as f:
+            npt.assert_equal(content in f.read(), False)
+
+        other_digest = store.put(b'Other Content')
+        npt.assert_equal(sorted(store.digests()),
+                         sorted([digest, other_digest]))
+
+        npt.assert_equal(store.prune({digest}), 1)
+        npt.assert_equal(list(store.digests()), [digest])
+
+        with npt.assert_raises(KeyError):
+            store.get(other_digest)
+
+        # Large contents are stored chunk by chunk with the same digest
+        large_content = os.urandom(3 * 1024 * 1024)
+        large_path = pjoin(tdir, 'large.bin')
+        with open(large_path, 'wb') as f:
+            f.write(large_content)
+
+        large_digest = store.put_file(large_path)
+        npt.assert_equal(large_digest, store.hash(large_content))
+        npt.assert_equal(store.put_stream(BytesIO(large_content)), large_digest)
+        npt.assert_equal(len(list(store.iter_content(large_digest))), 3)
+        npt.assert_equal(store.get(large_digest), large_content)
+
+        with open(store.object_path(large_digest), 'rb') as f:
+            npt.assert_equal(is_stream(f.read()), True)
+
+        npt.assert_equal(store.put_stream([content]), digest)
+        npt.assert_equal(list(store.iter_content(digest)), [content])
+
+        npt.assert_equal(store.prune({digest}), 1)
+
+        # Content encrypted elsewhere is stored as is
+        encrypted_content = b'Encrypted Content'
+        encrypted_digest = store.hash(encrypted_content)
+        npt.assert_equal(store.put_encrypted(
+            encrypted_digest, list(crypt.encrypt_stream(encrypted_content))),
+            encrypted_digest)
+        npt.assert_equal(store.get(encrypted_digest), encrypted_content)
+        npt.assert_equal(store.prune({digest}), 1)
+
+        # Digests are keyed, a different key gives a different digest
+        other_store = ObjectStore(tdir, Crypt('other.key', tdir))
+        npt.assert_equal(other_store.hash(content) != digest, True)
+
+
+def test_packs():
+    with InTemporaryDirectory() as tdir:
+        crypt = Crypt('crypt.key', tdir)
+        store = ObjectStore(tdir, crypt)
+
+        contents = [f'Test Content {idx}'.encode('utf-8') for idx in range(5)]
+        large_content = os.urandom(2 * 1024 * 1024 + 1)
+
+        store.open_pack()
+        digests = [store.put(content) for content in contents]
+        large_digest = store.put_stream(BytesIO(large_content))
+
+        # Duplicates are not written twice, even while streaming
+        npt.assert_equal(store.put(contents[0]), digests[0])
+        npt.assert_equal(store.put_stream([contents[1]]), digests[1])
+        npt.assert_equal(store.contains(digests[0]), True)
+        npt.assert_equal(store.put_encrypted(
+            digests[2], list(crypt.encrypt_stream(contents[2]))), digests[2])
+        store.close_pack()
+
+        # All objects live in a single pack, no loose objects are written
+        packs = os.listdir(pjoin(tdir, 'objects', 'packs'))
+        npt.assert_equal(len(packs), 1)
+        npt.assert_equal(isfile(store.object_path(digests[0])), False)
+
+        pack = Pack(pjoin(tdir, 'objects', 'packs', packs[0]))
+        npt.assert_equal(set(pack.entries), set(digests + [large_digest]))
+
+        with open(pack.path, 'rb') as f:
+            npt.assert_equal(contents[0] in f.read(), False)
+
+        # Objects can be read back by a new store through the pack index
+        store = ObjectStore(tdir, crypt)
+        for digest, content in zip(digests, contents):
+            npt.assert_equal(store.get(digest), content)
+        npt.assert_equal(store.get(large_digest), large_content)
+
+        # Loose objects and packs are read side by side
+        loose_digest = store.put(b'Loose Content')
+        npt.assert_equal(isfile(store.object_path(loose_digest)), True)
+        npt.assert_equal(sorted(store.digests()),
+                         sorted(digests + [large_digest, loose_digest]))
+
+        # Compressed objects keep the digest of their plain content
+        compressible = b'Compressible Content ' * 1000
+        store.open_pack()
+        npt.assert_equal(store.put(compressible, codec='zlib'), store.hash(compressible))
+        npt.assert_equal(store.put_stream(BytesIO(compressible * 200), codec='lzma'),
+                         store.hash(compressible * 200))
+        store.close_pack()
+
+        npt.assert_equal(store.get(store.hash(compressible)), compressible)
+        npt.assert_equal(store.get(store.hash(compressible * 200)), compressible * 200)
+        compressed_pack = [pack for pack in store._packs.values()
+                           if store.hash(compressible) in pack.entries][0]
+        npt.assert_equal(compressed_pack.entries[store.hash(compressible)][2], 1)
+        npt.assert_equal(os.path.getsize(compressed_pack.path) < len(compressible), True)
+
+        with npt.assert_raises(ValueError):
+            store.put_encrypted(store.hash(b'Loose'), [b''], flags=1)
+
+        npt.assert_equal(store.prune(set(digests + [large_digest, loose_digest])), 2)
+
+        # Partially referenced packs are rewritten
+        npt.assert_equal(store.prune({digests[0], large_digest}), 5)
+        npt.assert_equal(sorted(store.digests()),
+                         sorted([digests[0], large_digest]))
+        npt.assert_equal(os.listdir(pjoin(tdir, 'objects', 'packs')) != packs, True)
+        npt.assert_equal(store.get(digests[0]), contents[0])
+        npt.assert_equal(store.get(large_digest), large_content)
+
+        npt.assert_equal(store.prune(set()), 2)
+        npt.assert_equal(os.listdir(pjoin(tdir, 'objects', 'packs')), [])
+
+        # Packs that were never closed are ignored
+        writer = PackWriter(pjoin(tdir, 'objects', 'packs', 'unclosed.pack'))
+        writer.commit(digests[0], writer.write([b'data']))
+        writer._file.close()
+        npt.assert_equal(list(ObjectStore(tdir, crypt).digests()), [])
+
+        # Empty packs are not kept
+        store.open_pack()
+        store.close_pack()
+        npt.assert_equal(os.listdir(pjoin(tdir, 'objects', 'packs')),
+                         ['unclosed.pack'])
+
+        # Packs that were never closed are deleted when pruning, except
+        # the one being written
+        store.open_pack()
+        store.put(contents[0])
+        npt.assert_equal(store.prune(set()), 0)
+        npt.assert_equal(os.listdir(pjoin(tdir, 'objects', 'packs')),
+                         [os.path.basename(store._pack_writer.path)])
+        store.close_pack()
+        npt.assert_equal(list(store.digests()), [digests[0]])
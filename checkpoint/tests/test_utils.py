@@ -1,7 +1,10 @@
+import gc
 import json
+import weakref
 from os.path import join as pjoin
 from sys import version
 from tempfile import TemporaryDirectory as InTemporaryDirectory
+from threading import Thread
 
 import numpy.testing as npt
 import pytest
@@ -43,6 +46,81 @@ def test_logger(capsys, file_path):
         message += '\n'
         logged_message = io.read(pjoin(tdir, log_file_path))
         npt.assert_equal(logged_message, message)
+        file_logger.close()
+
+        # Buffered messages are written when the logger is flushed or closed
+        buffered_log_path = pjoin(tdir, 'buffered.log')
+        buffered_logger = utils.Logger(file_path=buffered_log_path, log_mode='f',
+                                       flush_interval=3600)
+        buffered_logger.log(msg='first')
+        buffered_logger.log(msg='second')
+        buffered_logger.flush()
+        npt.assert_equal(io.read(buffered_log_path), '[, ]: first - INFO\n[, ]: second - INFO\n')
+        buffered_logger.log(msg='third')
+        buffered_logger.log(msg='failed', log_type='ERROR')
+        # Errors are flushed right away
+        npt.assert_equal(io.read(buffered_log_path),
+                         '[, ]: first - INFO\n[, ]: second - INFO\n'
+                         '[, ]: third - INFO\n[, ]: failed - ERROR\n')
+        buffered_logger.close()
+
+        # Messages are written by a background thread
+        background_log_path = pjoin(tdir, 'background.log')
+        background_logger = utils.Logger(file_path=background_log_path, log_mode='f',
+                                         background=True)
+        threads = [Thread(target=background_logger.log, kwargs={'msg': f'message {idx}'})
+                   for idx in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        background_logger.close()
+
+        npt.assert_equal(sorted(io.read(background_log_path).splitlines()),
+                         sorted(f'[, ]: message {idx} - INFO' for idx in range(10)))
+
+        # Closed loggers are not kept alive until the exit
+        logger_ref = weakref.ref(background_logger)
+        del background_logger, threads
+        gc.collect()
+        npt.assert_equal(logger_ref(), None)
+
+
+def test_byte_budget():
+    with npt.assert_raises(ValueError):
+        _ = utils.ByteBudget(0)
+
+    budget = utils.ByteBudget(10)
+    npt.assert_equal(budget.acquire(6), True)
+    npt.assert_equal(budget.in_flight, 6)
+
+    acquired = []
+    waiting_thread = Thread(target=lambda: acquired.append(budget.acquire(6)))
+    waiting_thread.start()
+    waiting_thread.join(timeout=0.1)
+    npt.assert_equal(acquired, [])
+
+    budget.release(6)
+    waiting_thread.join()
+    npt.assert_equal(acquired, [True])
+    budget.release(6)
+
+    # Requests larger than the budget are granted when nothing is in flight
+    npt.assert_equal(budget.acquire(20), True)
+    budget.release(20)
+
+    budget.close()
+    npt.assert_equal(budget.acquire(1), False)
+
+
+def test_split_batches():
+    npt.assert_equal(utils.split_batches([], [], 10), [])
+    npt.assert_equal(utils.split_batches(list('abcde'), [1] * 5, 2),
+                     [['a', 'b'], ['c', 'd'], ['e']])
+
+    # Heavy items get a batch of their own
+    npt.assert_equal(utils.split_batches(list('abc'), [1, 50, 1], 10),
+                     [['a'], ['b'], ['c']])
 
 
 def test_get_reader_by_extension():
@@ -55,6 +133,9 @@ def test_get_reader_by_extension():
     npt.assert_equal(reader.__class__.__name__, 'TextReader')
     npt.assert_equal(invalid_reader, None)
 
+    # Readers are instantiated once and reused
+    npt.assert_equal(utils.get_reader_by_extension(extension) is reader, True)
+
 
 def test_execute_command():
     command = "python --version"
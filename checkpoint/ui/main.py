@@ -10,7 +10,8 @@ import eel.browsers
 
 try:
     from checkpoint.io import IO
-    from checkpoint.sequences import CLISequence
+    from checkpoint.manifest import Manifest
+    from checkpoint.sequences import CLISequence, _logger
     IN_DEVELOPMENT = False
 except ImportError:
     currentdir = os.path.dirname(os.path.abspath(__file__))
@@ -18,7 +19,8 @@ except ImportError:
     sys.path.insert(0, os.path.dirname(parentdir))
 
     from checkpoint.io import IO
-    from checkpoint.sequences import CLISequence
+    from checkpoint.manifest import Manifest
+    from checkpoint.sequences import CLISequence, _logger
     IN_DEVELOPMENT = True
 
 
@@ -78,6 +80,8 @@ def run_cli_sequence(args=None):
 def read_logs():
     """Read and parse the logs."""
 
+    # Messages still buffered by the logger of the sequences are read too
+    _logger.flush()
     io = IO()
     logs = io.read('logs.log')
     logs = logs.split('\n')
@@ -177,8 +181,21 @@ def generate_tree(checkpoint_name, target_directory):
     io = IO(target_directory)
     checkpoint_path = os.path.join(
         target_directory, '.checkpoint', checkpoint_name)
-    metadata = io.read(os.path.join(checkpoint_path, '.metadata'))
-    metadata = json.loads(metadata)
+    manifest_path = os.path.join(checkpoint_path, f'{checkpoint_name}.manifest')
+    if os.path.isfile(manifest_path):
+        folders = {}
+        with Manifest(manifest_path) as manifest:
+            for entry in manifest:
+                folder = tuple(entry.path.split('/')[:-1])
+                file = os.path.join(target_directory, *entry.path.split('/'))
+                folders.setdefault(folder, []).append(file)
+
+        # Parent folders have to come before their sub folders
+        metadata = {os.path.join(target_directory, *folder): folders[folder]
+                    for folder in sorted(folders)}
+    else:
+        metadata = io.read(os.path.join(checkpoint_path, '.metadata'))
+        metadata = json.loads(metadata)
 
     for folder, files in metadata.items():
         parent = None
@@ -1,13 +1,17 @@
 """Module that provides utility functions/classes."""
+import atexit
 import json
+import sys
 from datetime import datetime
-from inspect import getmodule, stack
 from os import getcwd
 from os.path import dirname, isfile
+from queue import Empty, SimpleQueue
 from subprocess import PIPE, CalledProcessError, Popen
+from threading import Condition, Lock, Thread
+from time import monotonic
 
 from checkpoint.io import IO
-from checkpoint.readers import get_all_readers
+from checkpoint.readers import get_reader_registry, sniff_reader
 
 
 class LogColors:
@@ -26,9 +30,13 @@ class LogColors:
 class Logger:
     """Provides logging utility functions."""
 
-    def __init__(self, file_path='logs.log', log_mode='t'):
+    def __init__(self, file_path='logs.log', log_mode='t', flush_interval=0,
+                 background=False):
         """Initialize the logger.
 
+        The log file is opened once, on the first message logged to it,
+        and stays open until the logger is closed.
+
         Parameters
         ----------
         file_path : str
@@ -37,6 +45,12 @@ class Logger:
             Log mode, can take values `t` or `f`.
             `t`: log in terminal
             `f`: log in file
+        flush_interval : float
+            Minimum number of seconds between two flushes of the log file,
+            0 flushes every message.
+        background : bool
+            If True, messages are written to the log file by a
+            background thread instead of the logging thread.
         """
         if not isfile(file_path):
             self._io_mode = 'a'
@@ -52,6 +66,18 @@ class Logger:
         self._io = IO(path=self._log_dir_path, mode=self._io_mode)
         self.log_mode = log_mode
         self.log_colors = LogColors()
+        self.flush_interval = flush_interval
+
+        self._file = None
+        self._last_flush = 0
+        self._lock = Lock()
+        self._queue = None
+        self._writer = None
+        if background:
+            self._queue = SimpleQueue()
+            self._writer = Thread(target=self._write_queue, daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
 
     def log(self, msg, colors=None, as_obj=False, timestamp=False,
             log_caller=False, log_type="INFO"):
@@ -71,11 +97,12 @@ class Logger:
             If True, the current function name will be added to the message.
         log_type : str
             Type of log, can take values `INFO`, `WARNING`, `ERROR`, `SUCCESS`, etc.
+            `WARNING` and `ERROR` messages are flushed to the log file right away.
         """
-
-        _caller = stack()[1]
-        _file = getmodule(_caller[0]).__file__.replace("/", "\\") * log_caller
-        _timestamp = datetime.now().strftime('%H:%M:%S') * timestamp
+        _file = ''
+        if log_caller:
+            _file = sys._getframe(1).f_globals.get('__file__', '').replace("/", "\\")
+        _timestamp = datetime.now().strftime('%H:%M:%S') if timestamp else ''
 
         colors = colors or [self.log_colors.BOLD]
         if not isinstance(colors, list):
@@ -89,16 +116,81 @@ class Logger:
         if self.log_mode == 't':
             print(f"{''.join(colors)}{msg}{self.log_colors.ENDC}")
         elif self.log_mode == 'f':
+            force_flush = log_type in ['WARNING', 'ERROR']
             if not as_obj:
-                self._io.write(self._file_path, 'a', msg + '\n')
+                self._write(msg + '\n', force_flush)
             else:
-                with self._io.open(self._file_path, 'a') as f:
-                    _msg_key = list(msg.keys())[0][0]
-                    _msg_val = list(msg.values())[0]
-                    _msg = {_msg_key: _msg_val}
+                _msg_key = list(msg.keys())[0][0]
+                _msg_val = list(msg.values())[0]
+                self._write(json.dumps({_msg_key: _msg_val}) + '\n', force_flush)
+
+    def _write(self, line, force_flush=False):
+        """Write a line to the log file, or hand it to the background writer."""
+        if self._queue is not None:
+            self._queue.put(line)
+        else:
+            with self._lock:
+                self._write_lines([line], force_flush)
+
+    def _write_lines(self, lines, force_flush=False):
+        """Write lines to the log file, must be called with the lock held."""
+        if self._file is None:
+            self._file = self._io.open(self._file_path, 'a')
+            # Pending messages are written at exit, only while the file is open
+            atexit.register(self.close)
+
+        self._file.writelines(lines)
+
+        now = monotonic()
+        if force_flush or now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def _write_queue(self):
+        """Write the queued lines to the log file until the logger is closed."""
+        closed = False
+        while not closed:
+            lines = [self._queue.get()]
+            # Write everything that is already queued with a single flush
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            if None in lines:
+                closed = True
+                lines = [line for line in lines if line is not None]
+
+            with self._lock:
+                if lines:
+                    self._write_lines(lines, force_flush=True)
+
+    def flush(self):
+        """Write the buffered messages to the log file.
+
+        Messages queued for the background writer are flushed by it as
+        soon as they are written.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._last_flush = monotonic()
 
-                    json.dump(_msg, f)
-                    f.write('\n')
+    def close(self):
+        """Write the pending messages and close the log file."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+            self._queue = None
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+        atexit.unregister(self.close)
 
     @property
     def log_mode(self):
@@ -121,28 +213,140 @@ class Logger:
         self._log_mode = log_mode
 
 
-def get_reader_by_extension(extension):
+class ByteBudget:
+    """Provides a budget of bytes shared between threads.
+
+    Used to bound the amount of file content that is in flight
+    between the stages of a streaming sequence.
+    """
+
+    def __init__(self, max_bytes):
+        """Initialize the byte budget.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Maximum number of bytes that can be acquired at once.
+        """
+        if max_bytes <= 0:
+            raise ValueError(f'Invalid byte budget: {max_bytes}')
+
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.closed = False
+        self._condition = Condition()
+
+    def acquire(self, num_bytes):
+        """Acquire bytes from the budget, blocks until they are available.
+
+        A request larger than the whole budget is granted once
+        nothing else is in flight, so that it can never deadlock.
+
+        Parameters
+        ----------
+        num_bytes : int
+            Number of bytes to acquire.
+
+        Returns
+        -------
+        bool
+            False if the budget was closed while waiting.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.closed or not self.in_flight or
+                self.in_flight + num_bytes <= self.max_bytes)
+            if self.closed:
+                return False
+
+            self.in_flight += num_bytes
+            return True
+
+    def release(self, num_bytes):
+        """Release bytes back to the budget.
+
+        Parameters
+        ----------
+        num_bytes : int
+            Number of bytes to release.
+        """
+        with self._condition:
+            self.in_flight -= num_bytes
+            self._condition.notify_all()
+
+    def close(self):
+        """Close the budget and wake up all the waiting threads."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+def get_reader_by_extension(extension, files=None):
     """Get the reader by an extension.
 
     Parameters
     ----------
     extension : str
         Extension of the file.
+    files : list, optional
+        Files with the extension, if the extension has no default reader
+        the reader is guessed from their content.
 
     Returns
     -------
     reader: :class: `checkpoint.readers.Reader`
-        Reader class.
+        Reader instance, shared by all the calls with the same extension.
     """
-    readers = get_all_readers()
+    reader = get_reader_registry().get(extension)
+    if not reader and files:
+        reader = sniff_reader(extension, files)
+
+    if reader:
+        return reader
 
-    for reader in readers:
-        reader_obj = reader()
-        if extension in reader_obj.valid_extensions:
-            return reader_obj
     print(f'{LogColors.ERROR}No default reader found for {extension}{LogColors.ENDC}')
 
 
+def split_batches(items, weights, max_weight):
+    """Split items into contiguous batches of bounded weight.
+
+    Parameters
+    ----------
+    items: list
+        Items to be split.
+    weights: list of int
+        Weight of each item.
+    max_weight: int
+        A batch is closed as soon as its weight reaches this value, an
+        item at least that heavy gets a batch of its own.
+
+    Returns
+    -------
+    list
+        List of batches of items.
+    """
+    batches = []
+    batch = []
+    batch_weight = 0
+    for item, weight in zip(items, weights):
+        if batch and weight >= max_weight:
+            batches.append(batch)
+            batch = []
+            batch_weight = 0
+
+        batch.append(item)
+        batch_weight += weight
+        if batch_weight >= max_weight:
+            batches.append(batch)
+            batch = []
+            batch_weight = 0
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
 def execute_command(command):
     """Execute a command and get continuous output.
 